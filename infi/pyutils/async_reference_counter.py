@@ -0,0 +1,155 @@
+"""
+An asyncio counterpart of reference_counter.ReferenceCounter, for resources that are opened and closed
+asynchronously. Hooks are coroutines, and all the operations that may run them are coroutines as well::
+
+    class Session(AsyncReferenceCounter):
+        async def _on_reference_first_added(self):
+            self._connection = await connect(...)
+        async def _on_reference_last_dropped(self):
+            await self._connection.close()
+
+    async with session.get_reference_context():
+        ...
+"""
+import asyncio
+import inspect
+import logging
+import sys
+from six import reraise
+from . import reference_counter
+from .reference_counter import InvalidReferenceCount, _check_for_dependency_cycle
+
+_logger = logging.getLogger(__name__)
+
+class AsyncReferenceCounter(object):
+    """
+    The 0->1 and 1->0 transitions (hooks and dependency propagation) are serialized: tasks adding or removing
+    references while a transition is in progress wait for it to finish, so concurrent acquirers share a single
+    in-flight _on_reference_first_added instead of starting their own.
+    Counters this counter depends on may be AsyncReferenceCounters or regular ReferenceCounters.
+    """
+    def __init__(self):
+        super(AsyncReferenceCounter, self).__init__()
+        self._reference = 0
+        self._depends_on = []
+        self._zero_refcount_callbacks = []
+        self._transition = None
+    def add_zero_refcount_callback(self, callback):
+        """Adds a callback called with the counter when its count drops to zero. The callback may be a coroutine function"""
+        self._zero_refcount_callbacks.append(callback)
+    async def _begin_transition(self):
+        while self._transition is not None:
+            await self._transition.wait()
+    def _start_transition(self):
+        self._transition = asyncio.Event()
+    def _end_transition(self):
+        transition, self._transition = self._transition, None
+        transition.set()
+    async def add_reference(self):
+        await self._begin_transition()
+        self._reference += 1
+        if self._reference == 1:
+            self._start_transition()
+            try:
+                await self._increase_dependents()
+                try:
+                    await self._on_reference_first_added()
+                except BaseException:
+                    await self._decrease_dependents()
+                    raise
+            except BaseException:
+                self._reference -= 1
+                raise
+            finally:
+                self._end_transition()
+        if reference_counter._tracer is not None:
+            reference_counter._tracer.on_add_reference(self)
+    async def depend_on_counter(self, counter):
+        _check_for_dependency_cycle(self, counter)
+        await self._begin_transition()
+        if self._reference == 0:
+            self._depends_on.append(counter)
+            return
+        self._start_transition()
+        try:
+            await _ADDREF(counter)
+            self._depends_on.append(counter)
+        finally:
+            self._end_transition()
+    async def _increase_dependents(self):
+        await self._for_each_dependent(_ADDREF, rollback=_DECREF)
+    async def _decrease_dependents(self):
+        await self._for_each_dependent(_DECREF, rollback=_ADDREF)
+    async def _for_each_dependent(self, action, rollback):
+        done = []
+        for c in self._depends_on:
+            try:
+                await action(c)
+            except BaseException:
+                for d in done:
+                    await rollback(d)
+                raise
+            else:
+                done.append(c)
+    async def remove_reference(self):
+        await self._begin_transition()
+        if self._reference <= 0:
+            raise InvalidReferenceCount()
+        self._reference -= 1
+        if self._reference == 0:
+            self._start_transition()
+            try:
+                try:
+                    await self._on_reference_last_dropped()
+                except BaseException:
+                    self._reference += 1
+                    raise
+                await self._decrease_dependents()
+            finally:
+                self._end_transition()
+        if reference_counter._tracer is not None:
+            reference_counter._tracer.on_remove_reference(self)
+        if self._reference == 0:
+            await self._call_zero_refcount_callbacks()
+    async def _call_zero_refcount_callbacks(self):
+        thrown = None
+        for callback in list(self._zero_refcount_callbacks):
+            try:
+                await _maybe_await(callback(self))
+            except BaseException:
+                _logger.debug("Exception caught during remove_reference", exc_info=True)
+                if thrown is None:
+                    thrown = sys.exc_info()
+        if thrown is not None:
+            reraise(*thrown)
+    def get_reference_context(self):
+        return _ReferenceContext(self)
+    def get_reference_count(self):
+        return self._reference
+    async def _on_reference_first_added(self):
+        pass
+    async def _on_reference_last_dropped(self):
+        pass
+
+class _ReferenceContext(object):
+    def __init__(self, counter):
+        super(_ReferenceContext, self).__init__()
+        self._counter = counter
+    async def __aenter__(self):
+        await self._counter.add_reference()
+        return self._counter
+    async def __aexit__(self, *_):
+        await self._counter.remove_reference()
+
+async def _maybe_await(result):
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+async def _ADDREF(counter):
+    await _maybe_await(counter.add_reference())
+
+async def _DECREF(counter):
+    await _maybe_await(counter.remove_reference())
+
+reference_counter._UNTRACED_MODULES.add(__name__)
@@ -1,5 +1,6 @@
+from array import array
 from packaging.version import Version, parse
-from .python_compat import OrderedDict, itervalues
+from .python_compat import OrderedDict, itervalues, basestring
 
 ALL = '0.0'
 
@@ -14,6 +15,8 @@ def _convert(version):
     return version
 
 class VersionedBase(object):
+    __slots__ = ('_version',)
+
     def __init__(self, version=ALL):
         self._version = _convert(version)
 
@@ -35,6 +38,54 @@ class VersionedBase(object):
         return (self.__class__, (str(self._version),))
 
 
+class _VersionTable(object):
+    """
+    The immutable version -> aliases mapping of a value. It is shared between all the views of the same value,
+    so binding a value (or an enum) to a version never copies it.
+    """
+    __slots__ = ('key', 'upper_key', 'hash', 'versions', 'aliases', 'owner', 'ordinal', 'rank', '_resolved')
+
+    def __init__(self, key, values):
+        super(_VersionTable, self).__init__()
+        items = sorted(((_convert(version), tuple(aliases)) for version, aliases in values.items()), reverse=True)
+        self.key = key
+        self.upper_key = key.upper()
+        self.hash = hash(key)
+        self.versions = tuple(version for version, _ in items)
+        self.aliases = tuple(aliases for _, aliases in items)
+        self.owner = self.ordinal = self.rank = None
+        self._resolved = {}
+
+    def owned_by(self, owner, ordinal):
+        """Returns a table with the same versions and aliases, belonging to the given enum table"""
+        returned = object.__new__(_VersionTable)
+        for attr in ('key', 'upper_key', 'hash', 'versions', 'aliases', '_resolved'):
+            setattr(returned, attr, getattr(self, attr))
+        returned.owner = owner
+        returned.ordinal = returned.rank = ordinal
+        return returned
+
+    def resolve(self, version):
+        """Returns a (aliases, lowercase aliases) pair for the version, or None if the value does not exist in it"""
+        try:
+            return self._resolved[version]
+        except KeyError:
+            pass
+        returned = None
+        if version is not None:
+            for table_version, aliases in zip(self.versions, self.aliases):
+                if version >= table_version:
+                    returned = (aliases, frozenset(str(alias).lower() for alias in aliases))
+                    break
+        self._resolved[version] = returned
+        return returned
+
+    def items(self):
+        return zip(self.versions, self.aliases)
+
+
+_NO_VALUES = ((), frozenset())
+
 class Value(VersionedBase):
     """
     Create a value list, or a versioned value list. To specify versions, use a dict, otherwise, use a list of values.
@@ -60,69 +111,87 @@ class Value(VersionedBase):
     True    
     
     """
+    __slots__ = ('_table',)
+
     def __init__(self, key, list_or_dict=None, default_version=ALL, **kwargs):
         super(Value, self).__init__(default_version)
-        if isinstance(key, Value):
-            key = str(key)
-        self._key = str(key)
+        key = str(key)
         if list_or_dict is None:
             list_or_dict = []
         if isinstance(list_or_dict, dict):
-            self._construct_from_dict(list_or_dict)
+            self._construct_from_dict(key, list_or_dict)
         else:
             if 'aliases' in kwargs:
                 # For backwards compatibility with old non versioned enums
                 list_or_dict = kwargs.get('aliases')
-            self._construct_from_list(list_or_dict)
+            self._construct_from_list(key, list_or_dict)
 
-    def _construct_from_list(self, values):
-        converted_values = [self._key]
+    def _construct_from_list(self, key, values):
+        converted_values = [key]
         for value in values:
             if isinstance(value, Value):
                 converted_values.extend(value.get_values())
             else:
                 converted_values.append(value)
-        self._construct_from_dict({ALL:converted_values})
+        self._construct_from_dict(key, {ALL:converted_values})
         self.bind_to_version(ALL)
 
-    def _construct_from_dict(self, values):
-        self._values = OrderedDict((_convert(k), values[k]) for k in reversed(sorted(values.keys())))
+    def _construct_from_dict(self, key, values):
+        self._table = _VersionTable(key, values)
+
+    @property
+    def _key(self):
+        return self._table.key
 
     def get_name(self):
-        return self._key
+        return self._table.key
 
     def get_values(self):
         if not self.is_bound():
-            raise UnboundException('Versioned value {0} is not bound'.format(self._key))
-        return self._get_values(raise_exc=True)
+            raise UnboundException('Versioned value {0} is not bound'.format(self._table.key))
+        return list(self._get_values(raise_exc=True))
 
     def _get_values(self, raise_exc=False):
-        for v in self._values.keys():
-            if self._version >= v:
-                return self._values[v]
+        resolved = self._table.resolve(self._version)
+        if resolved is not None:
+            return resolved[0]
         if raise_exc:
-            raise UnboundException('No values of {0} could be found for version {1}'.format(self._key, self._version))
-        return []
+            raise UnboundException('No values of {0} could be found for version {1}'.format(self._table.key, self._version))
+        return ()
+
+    def _get_lowercase_values(self):
+        return (self._table.resolve(self._version) or _NO_VALUES)[1]
 
     def get_value(self):
         values = self.get_values()
         if values:
             return values[0]
-        raise UnboundException('No value of {0} could be found for version {1}'.format(self._key, self._version))
+        raise UnboundException('No value of {0} could be found for version {1}'.format(self._table.key, self._version))
 
-    def _copy(self):
-        return Value(self._key, self._values, default_version=self._version)
+    def _copy(self, table=None):
+        returned = object.__new__(type(self))
+        returned._table = self._table if table is None else table
+        returned._version = self._version
+        return returned
+
+    def __deepcopy__(self, memo):
+        return self._copy()
+
+    def get_ordinal(self):
+        """Returns the position of the value in the enum it was defined in, or None if it is not an enum member"""
+        return self._table.ordinal
 
     def __hash__(self, *args, **kwargs):
-        return self._key.__hash__()
+        return self._table.hash
 
     def __eq__(self, o):
-        compare_values = [str(v).lower() for v in self._get_values()]
+        compare_values = self._get_lowercase_values()
         if isinstance(o, Value):
-            other_values = [str(v).lower() for v in o._get_values()]
-        else:
-            other_values = [str(o).lower()]
-        return compare_values == other_values or any(v in compare_values for v in other_values)
+            other_values = o._get_lowercase_values()
+            if not compare_values and not other_values:
+                return True
+            return not compare_values.isdisjoint(other_values)
+        return str(o).lower() in compare_values
 
     def __ne__(self, o):
         return not self == o
@@ -131,19 +200,106 @@ class Value(VersionedBase):
         return self.as_version(version)
     
     def __str__(self):
-        return self._key.upper()
+        return self._table.upper_key
 
     def __cmp__(self, other):
+        if self._is_same_enum(other):
+            return cmp(self._table.rank, other._table.rank)
         return cmp(str(self), str(other))
 
     def __lt__(self, other):
+        if self._is_same_enum(other):
+            return self._table.rank < other._table.rank
         return str(self) < str(other)
 
+    def _is_same_enum(self, other):
+        return isinstance(other, Value) and self._table.owner is not None and self._table.owner is other._table.owner
+
     def __repr__(self):
-        return self._key.upper()
+        return self._table.upper_key
 
     def __reduce__(self, *args, **kwargs):
-        return (self.__class__, (self._key, dict((str(k), v) for k, v in self._values.items()), str(self._version)))
+        owner = self._table.owner
+        if owner is not None and owner.name is not None:
+            # Members of registered enums are pickled by reference, and unpickled to shared instances
+            return (_get_registered_member, (owner.name, str(self), self.get_bound_version()))
+        return (self.__class__, (self._table.key, dict((str(k), list(v)) for k, v in self._table.items()), str(self._version)))
+
+
+class _UnknownValuePolicy(object):
+    def __init__(self, name):
+        super(_UnknownValuePolicy, self).__init__()
+        self._name = name
+    def __repr__(self):
+        return "<{0}>".format(self._name)
+
+RAISE_ON_UNKNOWN = _UnknownValuePolicy("RAISE_ON_UNKNOWN")
+SKIP_UNKNOWN = _UnknownValuePolicy("SKIP_UNKNOWN")
+
+
+class _EnumTable(object):
+    """The members of an enum, shared between all of its bound views"""
+    __slots__ = ('members', 'keys', 'name', 'ordered', '_lookups', '_interned')
+
+    def __init__(self, values, name, ordered):
+        super(_EnumTable, self).__init__()
+        self.members = OrderedDict()
+        for value in values:
+            if not isinstance(value, Value):
+                value = Value(value)
+            self.members[str(value)] = value._copy(value._table.owned_by(self, len(self.members)))
+        self.keys = tuple(self.members)
+        self.set_ordered(ordered)
+        self.name = name
+        self._lookups = {}
+        self._interned = {}
+
+    def set_ordered(self, ordered):
+        self.ordered = ordered
+        # Unordered members compare by name, like values that are not enum members, but through precomputed ranks
+        keys = self.keys if ordered else sorted(self.keys)
+        for rank, key in enumerate(keys):
+            self.members[key]._table.rank = rank
+
+    def get_interned_view(self, version):
+        """Returns the view of the enum shared by everything unpickled with the given version"""
+        version = _convert(version)
+        try:
+            return self._interned[version]
+        except KeyError:
+            pass
+        returned = self._interned[version] = Enum._from_table(self, version)
+        return returned
+
+    def get_lookup(self, version):
+        """
+        Returns a dict mapping raw values to member indexes for the version. Lowercase aliases are mapped to the
+        first member having them (like a linear search would), and the original spelling of string aliases is
+        mapped to the same member, so exact matches skip the lowercasing.
+        """
+        try:
+            return self._lookups[version]
+        except KeyError:
+            pass
+        returned = {}
+        for index, value in enumerate(itervalues(self.members)):
+            aliases, lowercase_aliases = value._table.resolve(version) or _NO_VALUES
+            for alias in lowercase_aliases:
+                returned.setdefault(alias, index)
+        for value in itervalues(self.members):
+            for alias in (value._table.resolve(version) or _NO_VALUES)[0]:
+                if isinstance(alias, basestring):
+                    returned.setdefault(alias, returned[alias.lower()])
+        self._lookups[version] = returned
+        return returned
+
+
+def _lookup_index(lookup, value):
+    try:
+        return lookup[value]
+    except (KeyError, TypeError):
+        return lookup.get(str(value).lower())
+
 
 class Enum(VersionedBase):
     """
@@ -165,61 +321,186 @@ class Enum(VersionedBase):
     True
     >>> "FALSE" in x
     True    
+
+    Binding an enum to a version (as_version) does not copy its values: every view shares the same member table,
+    and the values of a view are created lazily, on first access.
+
+    Enums created with a *name* (which should be the qualified name of the enum, e.g. 'package.module.COLORS') are
+    registered under it, and they and their members are pickled as a reference to that name. When unpickled, they
+    resolve to instances shared by the whole process (the module part of the name is imported if needed), so these
+    instances should not be rebound with bind_to_version.
+
+    Each member is given an ordinal - its position in the enum (see Value.get_ordinal), which is also its code in
+    *codes*. Members of the same enum are compared (and sorted) using precomputed integers: by name, the same
+    way values are compared to strings or to values of other enums, or, if the enum is created with ordered=True,
+    by ordinal.
+
+    Members are accessible as case-insensitive attributes. Since members are resolved only after regular attribute
+    lookup fails, a member whose name collides with an Enum method (e.g. ``get``) is reachable only by indexing.
     """
     def __init__(self, *values, **kwargs):
         default_version = kwargs.get('default_version', ALL)
+        name = kwargs.get('name', None)
         super(Enum, self).__init__(default_version)
-        self._values = OrderedDict()
-        for value in values:
-            if not isinstance(value, Value):
-                value = Value(value)
-            self._values[str(value)] = value.as_version(default_version)
+        self._table = _EnumTable(values, name, kwargs.get('ordered', False))
+        self._bound = {}
+        if name is not None:
+            _REGISTERED_ENUMS[name] = self._table
+
+    @classmethod
+    def _from_table(cls, table, version):
+        returned = object.__new__(cls)
+        returned._table = table
+        returned._version = version
+        returned._bound = {}
+        return returned
 
     def bind_to_version(self, version):
         super(Enum, self).bind_to_version(version)
-        for value in itervalues(self._values):
+        for value in itervalues(self._bound):
             value.bind_to_version(version)
             
     def _copy(self):
-        return Enum(*itervalues(self._values), default_version=self._version)
+        return self._from_table(self._table, self._version)
 
-    def get(self, value):
+    def __deepcopy__(self, memo):
+        return self._copy()
+
+    def _get_member(self, key):
+        try:
+            return self._bound[key]
+        except KeyError:
+            pass
+        returned = self._bound[key] = self._table.members[key].as_version(self._version)
+        return returned
+
+    def _get_lookup(self):
         if not self.is_bound():
             raise UnboundException("Can't lookup value for unbound versioned dict")
-        for v in itervalues(self._values):
-            if v == value:
-                return v
+        return self._table.get_lookup(self._version)
+
+    def get(self, value):
+        lookup = self._get_lookup()
+        if isinstance(value, Value):
+            for v in self:
+                if v == value:
+                    return v
+        else:
+            index = _lookup_index(lookup, value)
+            if index is not None:
+                return self._get_member(self._table.keys[index])
         raise UnboundException('Could not find matching value for {0}'.format(value))
 
+    def parse_many(self, raw_values, unknown=RAISE_ON_UNKNOWN):
+        """
+        Returns a list of the members matching each of the raw values, as *get* would.
+        Unknown values raise UnboundException with RAISE_ON_UNKNOWN, are dropped with SKIP_UNKNOWN, and are
+        replaced by *unknown* otherwise.
+        """
+        return self._translate(raw_values, unknown, list(self))
+
+    def codes(self, raw_values, unknown=RAISE_ON_UNKNOWN, typecode=None):
+        """
+        Like *parse_many*, but returns the index of each member in the enum instead of the member itself.
+        If *typecode* is given, the codes are returned as an array.array of that type (e.g. 'H'), which can
+        also be handed to numpy.frombuffer without copying.
+        """
+        returned = self._translate(raw_values, unknown, range(len(self._table.keys)))
+        if typecode is not None:
+            returned = array(typecode, returned)
+        return returned
+
+    def from_codes(self, codes):
+        """Returns the members matching codes returned by *codes*"""
+        members = list(self)
+        return [members[code] for code in codes]
+
+    def _translate(self, raw_values, unknown, translated):
+        lookup = self._get_lookup()
+        returned = []
+        append = returned.append
+        for raw_value in raw_values:
+            try:
+                index = lookup[raw_value]
+            except (KeyError, TypeError):
+                index = lookup.get(str(raw_value).lower())
+                if index is None:
+                    if unknown is SKIP_UNKNOWN:
+                        continue
+                    if unknown is RAISE_ON_UNKNOWN:
+                        raise UnboundException('Could not find matching value for {0}'.format(raw_value))
+                    append(unknown)
+                    continue
+            append(translated[index])
+        return returned
+
+    def __contains__(self, value):
+        if not self.is_bound():
+            return False
+        if isinstance(value, Value):
+            return any(v == value for v in self)
+        return _lookup_index(self._get_lookup(), value) is not None
+
     def __iter__(self):
-        return itervalues(self._values)
+        return (self._get_member(key) for key in self._table.members)
 
-    def __getattribute__(self, key):
+    def __getattr__(self, key):
+        # Only called for names that are not real attributes, so methods are looked up at full speed.
+        # A resolved member is stored in the instance dict under the spelling it was requested with,
+        # making subsequent accesses plain attribute hits.
         if key.startswith('_'):
-            return super(Enum, self).__getattribute__(key)
+            raise AttributeError(key)
         try:
-            return self[key]
+            returned = self[key]
         except KeyError:
-            return super(Enum, self).__getattribute__(key)
+            raise AttributeError("{0!r} object has no attribute {1!r}".format(type(self).__name__, key))
+        self.__dict__[key] = returned
+        return returned
 
     def __getitem__(self, key):
         if isinstance(key, Value):
             key = str(key)
-        return self._values[key.upper()]
+        return self._get_member(key.upper())
 
     def __repr__(self):
-        return [v for v in itervalues(self._values)].__repr__()
+        return list(self).__repr__()
 
     def __reduce__(self, *args, **kwargs):
-        return (self.__class__, tuple(itervalues(self._values)), {'default_version':str(self._version)})
+        if self._table.name is not None:
+            return (_get_registered_enum, (self._table.name, self.get_bound_version()))
+        state = {'default_version':str(self._version)}
+        if self._table.ordered:
+            state['ordered'] = True
+        return (self.__class__, tuple(itervalues(self._table.members)), state)
     
     def __setstate__(self, state):
-        if '_values' in state:
-            self._values = state['values']
+        if state.get('ordered', False):
+            self._table.set_ordered(True)
         if 'default_version' in state:
             self.bind_to_version(state['default_version'])
         
     def __eq__(self, other):
         if type(self) != type(other):
             return NotImplemented
-        return self._version == other._version and self._values == other._values
+        return self._version == other._version and \
+            list(self._table.members) == list(other._table.members) and \
+            list(self) == list(other)
+
+
+_REGISTERED_ENUMS = {}
+
+def _get_registered_table(name):
+    if name not in _REGISTERED_ENUMS:
+        module_name = name.rpartition('.')[0]
+        if module_name:
+            __import__(module_name)
+    try:
+        return _REGISTERED_ENUMS[name]
+    except KeyError:
+        raise LookupError("No enum is registered as {0!r}".format(name))
+
+def _get_registered_enum(name, version):
+    return _get_registered_table(name).get_interned_view(version)
+
+def _get_registered_member(name, key, version):
+    return _get_registered_enum(name, version)[key]
@@ -1,9 +1,12 @@
-from types import MethodType
+from types import MethodType, FunctionType, BuiltinFunctionType
 import copy
 import inspect
 import itertools
 import platform
+import weakref
+from .decorators import _get_innner_func
 from .exceptions import (
+    ReflectionException,
     SignatureException,
     InvalidKeywordArgument,
     UnknownArguments,
@@ -16,21 +19,249 @@ if _IS_PY3:
     iteritems = dict.items
     izip = zip
     basestring = str
+    ClassType = type
 else:
+    from types import ClassType
     izip = itertools.izip
     iteritems = dict.iteritems
 
+POSITIONAL_ONLY = "POSITIONAL_ONLY"
+POSITIONAL_OR_KEYWORD = "POSITIONAL_OR_KEYWORD"
+KEYWORD_ONLY = "KEYWORD_ONLY"
+
 _NO_DEFAULT = object()
+_NO_ANNOTATION = object()
 
 class Argument(object):
-    def __init__(self, name, default=_NO_DEFAULT):
+    def __init__(self, name, default=_NO_DEFAULT, kind=POSITIONAL_OR_KEYWORD, annotation=_NO_ANNOTATION):
         super(Argument, self).__init__()
         self.name = name
         self.default = default
+        self.kind = kind
+        self.annotation = annotation
     def has_default(self):
         return self.default is not _NO_DEFAULT
+    def has_annotation(self):
+        return self.annotation is not _NO_ANNOTATION
+
+if hasattr(inspect, "signature"):
+    _PARAMETER_KINDS = {
+        inspect.Parameter.POSITIONAL_ONLY: POSITIONAL_ONLY,
+        inspect.Parameter.POSITIONAL_OR_KEYWORD: POSITIONAL_OR_KEYWORD,
+        inspect.Parameter.KEYWORD_ONLY: KEYWORD_ONLY,
+        }
+    def _get_parameters(func):
+        """Returns the arguments of func, and the names of its *args and **kwargs (or None)"""
+        arguments = []
+        varargs_name = kwargs_name = None
+        for parameter in inspect.signature(func).parameters.values():
+            if parameter.kind == parameter.VAR_POSITIONAL:
+                varargs_name = parameter.name
+            elif parameter.kind == parameter.VAR_KEYWORD:
+                kwargs_name = parameter.name
+            else:
+                arguments.append(Argument(
+                    parameter.name,
+                    _NO_DEFAULT if parameter.default is parameter.empty else parameter.default,
+                    _PARAMETER_KINDS[parameter.kind],
+                    _NO_ANNOTATION if parameter.annotation is parameter.empty else parameter.annotation))
+        return arguments, varargs_name, kwargs_name
+else:
+    def _get_parameters(func):
+        """Returns the arguments of func, and the names of its *args and **kwargs (or None)"""
+        args, varargs_name, kwargs_name, defaults = inspect.getargspec(_get_innner_func(func))
+        defaults = [] if defaults is None else defaults
+        filled_defaults = itertools.chain(itertools.repeat(_NO_DEFAULT, len(args) - len(defaults)), defaults)
+        return [Argument(arg_name, default) for arg_name, default in izip(args, filled_defaults)], varargs_name, kwargs_name
+
+class _ArgumentSpec(object):
+    """
+    The arguments of a function, as parsed from its signature. Specs are cached per function (see
+    _get_argument_spec) and shared by all the signatures of that function and of methods bound to it,
+    so they must not be modified.
+    """
+    def __init__(self, func):
+        super(_ArgumentSpec, self).__init__()
+        self.code = getattr(func, "__code__", None)
+        self.defaults = getattr(func, "__defaults__", None)
+        self.kwdefaults = getattr(func, "__kwdefaults__", None)
+        try:
+            arguments, self.varargs_name, self.kwargs_name = _get_parameters(func)
+        except (TypeError, ValueError):
+            # no signature is available (e.g. for some builtins)
+            arguments = []
+            self.varargs_name = 'args'
+            self.kwargs_name = 'kwargs'
+        self.args = [argument for argument in arguments if argument.kind != KEYWORD_ONLY]
+        self.kwonly_args = [argument for argument in arguments if argument.kind == KEYWORD_ONLY]
+        self._tables = {}
+    def get_tables(self, num_skipped_args):
+        """Returns the argument tables for the arguments following the first *num_skipped_args*"""
+        returned = self._tables.get(num_skipped_args)
+        if returned is None:
+            returned = self._tables[num_skipped_args] = _ArgumentTables(self, self.args[num_skipped_args:])
+        return returned
+    def is_valid_for(self, func):
+        # functions are mutable - make sure the spec wasn't parsed before their code or defaults were replaced
+        return func.__code__ is self.code and func.__defaults__ is self.defaults and \
+            getattr(func, "__kwdefaults__", None) is self.kwdefaults
+
+class _ArgumentTables(object):
+    """Per-kind lookup tables of the arguments of a signature, and its compiled normalizer"""
+    def __init__(self, spec, positional_args):
+        super(_ArgumentTables, self).__init__()
+        self.positional_args = positional_args
+        self._kwonly_args = spec.kwonly_args
+        self.positional_names = tuple(arg.name for arg in positional_args)
+        self.positional_only_names = frozenset(arg.name for arg in positional_args if arg.kind == POSITIONAL_ONLY)
+        self.kwonly_names = tuple(arg.name for arg in spec.kwonly_args)
+        self.keyword_names = frozenset(arg.name for arg in itertools.chain(positional_args, spec.kwonly_args)
+                                       if arg.kind != POSITIONAL_ONLY)
+        self.names = frozenset(self.positional_names + self.kwonly_names)
+        self.required_names = frozenset(arg.name for arg in itertools.chain(positional_args, spec.kwonly_args)
+                                        if not arg.has_default())
+        self.has_varargs = spec.varargs_name is not None
+        self.has_varkwargs = spec.kwargs_name is not None
+        self.normalize = _compile_normalizer(self)
+        self._call_key = None
+    def get_call_key(self):
+        if self._call_key is None:
+            self._call_key = _compile_call_key(self, itertools.chain(self.positional_args, self._kwonly_args))
+        return self._call_key
+
+_ARGUMENT_SPECS = weakref.WeakKeyDictionary()
+
+_MAX_UNROLLED_ARGS = 16
+
+def _compile_normalizer(tables):
+    """
+    Generates a function normalizing (args, kwargs) for the given argument tables, as
+    FunctionSignature.get_normalized_args does. The generated function returns None instead of raising, and leaves
+    it to the caller to find out what is wrong, so no error is constructed on the fast path.
+    """
+    names = tables.positional_names
+    def _dict_source(num_args):
+        if len(names) > _MAX_UNROLLED_ARGS:
+            return "dict(zip(NAMES, args))"
+        return "{%s}" % ", ".join("%r: args[%s]" % (name, index) for index, name in enumerate(names[:num_args]))
+    lines = ["def normalize(args, kwargs):",
+             "    num_args = len(args)",
+             "    if num_args == %s:" % len(names),
+             "        returned = %s" % _dict_source(len(names))]
+    if len(names) <= _MAX_UNROLLED_ARGS:
+        for num_args in range(len(names)):
+            lines.extend(["    elif num_args == %s:" % num_args,
+                          "        returned = %s" % _dict_source(num_args)])
+    else:
+        lines.extend(["    elif num_args < %s:" % len(names),
+                      "        returned = dict(zip(NAMES, args))"])
+    lines.append("    else:")
+    if tables.has_varargs:
+        lines.extend(["        returned = %s" % _dict_source(len(names)),
+                      "        for index in range(num_args - %s):" % len(names),
+                      "            returned[index] = args[index + %s]" % len(names)])
+    else:
+        lines.append("        return None")
+    lines.append("    if kwargs:")
+    if tables.has_varkwargs:
+        lines.extend(["        for name in kwargs:",
+                      "            if not isinstance(name, basestring):",
+                      "                return None"])
+        if tables.positional_only_names:
+            lines.extend(["        if not POSITIONAL_ONLY.isdisjoint(kwargs):",
+                          "            return None"])
+    else:
+        lines.extend(["        if not KEYWORDS.issuperset(kwargs):",
+                      "            return None"])
+    lines.extend(["        num_given = len(returned) + len(kwargs)",
+                  "        returned.update(kwargs)",
+                  "        if len(returned) != num_given:",
+                  "            return None"])
+    required = [name for name in names + tables.kwonly_names if name in tables.required_names]
+    if required:
+        lines.extend(["    if not (%s):" % " and ".join("%r in returned" % name for name in required),
+                      "        return None"])
+    lines.append("    return returned")
+    namespace = dict(NAMES=names, KEYWORDS=tables.keyword_names, POSITIONAL_ONLY=tables.positional_only_names,
+                     basestring=basestring)
+    exec(compile("\n".join(lines), "<normalizer>", "exec"), namespace)
+    return namespace["normalize"]
+
+class _UNHASHABLE_DEFAULT(object):
+    pass
+
+def _is_hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+def _compile_call_key(tables, arguments):
+    """
+    Generates a function returning a canonical key for (args, kwargs): a tuple of the values of all named arguments,
+    including defaults, followed (if the function receives *args or **kwargs) by a frozenset of the other items of
+    the normalized arguments. Omitted arguments with unhashable defaults are represented by _UNHASHABLE_DEFAULT
+    instead of their default, so the key of a call omitting them stays hashable. Like the normalizer, it returns
+    None for invalid calls. It raises TypeError if the extra arguments are unhashable.
+    """
+    namespace = dict(normalize=tables.normalize, NAMES=tables.names)
+    values = []
+    for index, argument in enumerate(arguments):
+        if argument.has_default():
+            default = argument.default if _is_hashable(argument.default) else _UNHASHABLE_DEFAULT
+            namespace["DEFAULT_%s" % index] = default
+            values.append("get(%r, DEFAULT_%s)" % (argument.name, index))
+        else:
+            values.append("normalized[%r]" % (argument.name,))
+    if tables.has_varargs or tables.has_varkwargs:
+        values.append("frozenset([item for item in normalized.items() if item[0] not in NAMES])")
+    lines = ["def call_key(args, kwargs):",
+             "    normalized = normalize(args, kwargs)",
+             "    if normalized is None:",
+             "        return None",
+             "    get = normalized.get",
+             "    return (%s)" % "".join("%s, " % value for value in values)]
+    exec(compile("\n".join(lines), "<call key>", "exec"), namespace)
+    return namespace["call_key"]
+
+def get_call_key_builder(func, is_method=False):
+    """
+    Returns a function mapping the (args, kwargs) of a call of func to a canonical key (see
+    FunctionSignature.get_call_key), or to None if the call is invalid. If *is_method* is true, func is assumed to be
+    an unbound method, and the first argument is expected not to be passed.
+    """
+    num_skipped_args = 1 if is_method or is_bound_method(func) else 0
+    return _get_argument_spec(func).get_tables(num_skipped_args).get_call_key()
+
+def canonical_call_key(func):
+    """Decorator setting func.get_call_key(*args, **kwargs) to return the canonical key of a call of func"""
+    call_key = get_call_key_builder(func)
+    def get_call_key(*args, **kwargs):
+        returned = call_key(args, kwargs)
+        if returned is None:
+            FunctionSignature(func).get_normalized_args(args, kwargs)
+        return returned
+    func.get_call_key = get_call_key
+    return func
+
+def _get_argument_spec(func):
+    if isinstance(func, MethodType):
+        func = func.__func__
+    if not isinstance(func, FunctionType):
+        return _ArgumentSpec(func)
+    returned = _ARGUMENT_SPECS.get(func)
+    if returned is None or not returned.is_valid_for(func):
+        returned = _ARGUMENT_SPECS[func] = _ArgumentSpec(func)
+    return returned
 
 class FunctionSignature(object):
+    """
+    The signature of a function, bound method or other callable.
+    Positional arguments (including positional-only ones) are available through get_args and friends, and
+    keyword-only arguments through get_kwonly_args. get_normalized_args maps a call's (args, kwargs) to a single
+    dict keyed by argument names, with extra positional arguments keyed by their index beyond the named ones.
+    """
     def __init__(self, func):
         super(FunctionSignature, self).__init__()
         self.func = func
@@ -40,24 +271,19 @@ class FunctionSignature(object):
         return is_bound_method(self.func)
     def is_class_method(self):
         return is_class_method(self.func)
-    def _iter_args_and_defaults(self, args, defaults):
-        defaults = [] if defaults is None else defaults
-        filled_defaults = itertools.chain(itertools.repeat(_NO_DEFAULT, len(args) - len(defaults)), defaults)
-        return izip(args, filled_defaults)
 
     def _build_arguments(self):
-        self._args = []
-        try:
-            args, varargs_name, kwargs_name, defaults = inspect.getargspec(self.func)
-        except TypeError:
-            args = []
-            varargs_name = 'args'
-            kwargs_name = 'kwargs'
-            defaults = []
-        for arg_name, default in self._iter_args_and_defaults(args, defaults):
-            self._args.append(Argument(arg_name, default))
-        self._varargs_name = varargs_name
-        self._kwargs_name = kwargs_name
+        spec = self._spec = _get_argument_spec(self.func)
+        self._tables = None
+        self._args = spec.args
+        self._kwonly_args = spec.kwonly_args
+        self._varargs_name = spec.varargs_name
+        self._kwargs_name = spec.kwargs_name
+    def _get_tables(self):
+        tables = self._tables
+        if tables is None:
+            tables = self._tables = self._spec.get_tables(len(self._args) - self.get_num_args())
+        return tables
     def get_args(self):
         return itertools.islice(self._args, 1 if self.is_bound_method() else 0, None)
     def get_num_args(self):
@@ -71,13 +297,55 @@ class FunctionSignature(object):
         return None
     def get_arg_names(self):
         return (arg.name for arg in self.get_args())
+    def get_kwonly_args(self):
+        return iter(self._kwonly_args)
+    def get_kwonly_arg_names(self):
+        return (arg.name for arg in self._kwonly_args)
     def get_required_arg_names(self):
-        return set(arg.name for arg in self.get_args() if not arg.has_default())
+        return set(self._get_tables().required_names)
     def has_variable_args(self):
         return self._varargs_name is not None
     def has_variable_kwargs(self):
         return self._kwargs_name is not None
     def get_normalized_args(self, args, kwargs):
+        tables = self._tables
+        if tables is None:
+            tables = self._get_tables()
+        returned = tables.normalize(args, kwargs)
+        if returned is None:
+            returned = self._get_normalized_args_slowly(args, kwargs)
+        return returned
+    def get_call_key(self, args, kwargs):
+        """
+        Returns a key identifying the call: calls passing the same values, whether positionally, by keyword or by
+        omitting arguments with the same default, get equal keys. The key is hashable if the values are.
+        Raises the same exceptions as get_normalized_args for invalid calls.
+        """
+        returned = self._get_tables().get_call_key()(args, kwargs)
+        if returned is None:
+            self._get_normalized_args_slowly(args, kwargs)
+        return returned
+    def normalize_many(self, calls):
+        """
+        Normalizes an iterable of (args, kwargs) pairs, like get_normalized_args does for each of them.
+        Returns a list of the normalized dicts (None for invalid calls), and a dict mapping the indexes of
+        invalid calls to the exceptions get_normalized_args would have raised for them.
+        """
+        normalize = self._get_tables().normalize
+        returned = []
+        append = returned.append
+        errors = {}
+        for index, (args, kwargs) in enumerate(calls):
+            normalized = normalize(args, kwargs)
+            if normalized is None:
+                try:
+                    normalized = self._get_normalized_args_slowly(args, kwargs)
+                except ReflectionException as e:
+                    errors[index] = e
+            append(normalized)
+        return returned, errors
+    def _get_normalized_args_slowly(self, args, kwargs):
+        """The reference implementation of get_normalized_args - only reached when the arguments are invalid"""
         returned = {}
         self._update_normalized_positional_args(returned, args)
         self._update_normalized_kwargs(returned, kwargs)
@@ -91,9 +359,12 @@ class FunctionSignature(object):
             returned[arg_name] = given_arg
 
     def _update_normalized_kwargs(self, returned, kwargs):
+        positional_only_names = self._get_tables().positional_only_names
         for arg_name, arg in iteritems(kwargs):
             if not isinstance(arg_name, basestring):
                 raise InvalidKeywordArgument("Invalid keyword argument %r" % (arg_name,))
+            if arg_name in positional_only_names:
+                raise UnknownArguments("%s received positional-only argument %s as a keyword argument" % (self.func_name, arg_name))
             if arg_name in returned:
                 raise SignatureException("%s is given more than once to %s" % (arg_name, self.func_name))
             returned[arg_name] = arg
@@ -108,7 +379,7 @@ class FunctionSignature(object):
         num_args = self.get_num_args()
         if positional_arg_count and not self.has_variable_args():
             raise UnknownArguments("%s receives %s positional arguments (%s specified)" % (self.func_name, num_args, num_args + positional_arg_count))
-        unknown = set(arg for arg in args_dict if not isinstance(arg, Number)) - set(self.get_arg_names())
+        unknown = set(arg for arg in args_dict if not isinstance(arg, Number)) - self._get_tables().names
         if unknown and not self.has_variable_kwargs():
             raise UnknownArguments("%s received unknown argument(s): %s" % (self.func_name, ",".join(unknown)))
 
@@ -0,0 +1,165 @@
+from .predicates import And, Or, Equality, ObjectAttributes, DictionaryItems, CompiledPredicate, _MISSING, _is_indexable
+from .python_compat import iteritems, itervalues, OrderedDict
+
+class _UNINDEXED(object):
+    pass
+
+class _Index(object):
+    """Maps the values of an attribute/key of the items (or the items themselves) to {id(item): item} buckets"""
+    def __init__(self, get_value):
+        super(_Index, self).__init__()
+        self._get_value = get_value
+        self._buckets = {}
+    def add(self, item):
+        value = self._get_value(item)
+        if value is _MISSING:
+            return value
+        if not _is_indexable(value):
+            value = _UNINDEXED
+        bucket = self._buckets.get(value)
+        if bucket is None:
+            bucket = self._buckets[value] = {}
+        bucket[id(item)] = item
+        return value
+    def remove(self, item, value):
+        if value is _MISSING:
+            return
+        bucket = self._buckets[value]
+        del bucket[id(item)]
+        if not bucket:
+            del self._buckets[value]
+    def get_candidates(self, value):
+        """Returns the buckets of the items that may have the given value, or None if the value can't be indexed"""
+        if not _is_indexable(value):
+            return None
+        return [b for b in (self._buckets.get(value), self._buckets.get(_UNINDEXED)) if b]
+
+def _get_attribute_getter(attr):
+    return lambda item: getattr(item, attr, _MISSING)
+
+def _get_key_getter(key):
+    def get_value(item):
+        try:
+            return item[key]
+        except LookupError:
+            return _MISSING
+    return get_value
+
+def _get_item(item):
+    return item
+
+class IndexedCollection(object):
+    """
+    A collection of items that keeps hash indexes on chosen attributes and/or keys of its items, to select the
+    items matching a predicate without evaluating it on every item::
+
+        volumes = IndexedCollection(all_volumes, attributes=['status', 'pool'])
+        volumes.select(And(ObjectAttributes(status='ok', pool=pool), Predicate(is_mapped)))
+
+    select() looks for equality conditions on indexed attributes (ObjectAttributes), keys (DictionaryItems) or on the
+    items themselves (Equality, if index_items is True) that every matching item must meet, in the predicate and its
+    And children, and evaluates the predicate only on the items of the smallest matching index bucket. An Or is
+    resolved through indexes if each of its children is. Items are held and compared by identity, so they need not
+    be hashable. Indexes are updated when items are added or removed; an item whose indexed attributes change while
+    it is in the collection should be passed to reindex().
+    Indexes assume that values which compare equal also hash equal. Unhashable values and enum Values (which are
+    equal to any of their aliases, in any case) can't be looked up by hash: items having them are candidates of
+    every select() through the index, and conditions on them are not resolved through indexes.
+    """
+    def __init__(self, items=(), attributes=(), keys=(), index_items=False):
+        super(IndexedCollection, self).__init__()
+        self._items = OrderedDict()
+        self._indexed_values = {}
+        # id(item) -> a number increasing in the order of self._items, for returning candidates in that order
+        self._positions = {}
+        self._next_position = 0
+        self._indexes = OrderedDict()
+        for attr in attributes:
+            self._indexes['attribute', attr] = _Index(_get_attribute_getter(attr))
+        for key in keys:
+            self._indexes['key', key] = _Index(_get_key_getter(key))
+        if index_items:
+            self._indexes['item', None] = _Index(_get_item)
+        for item in items:
+            self.add(item)
+    def add(self, item):
+        if id(item) in self._items:
+            return
+        self._items[id(item)] = item
+        self._positions[id(item)] = self._next_position
+        self._next_position += 1
+        self._indexed_values[id(item)] = [index.add(item) for index in itervalues(self._indexes)]
+    def remove(self, item):
+        if id(item) not in self._items:
+            raise ValueError("{0!r} is not in the collection".format(item))
+        del self._items[id(item)]
+        del self._positions[id(item)]
+        for index, value in zip(itervalues(self._indexes), self._indexed_values.pop(id(item))):
+            index.remove(item, value)
+    def reindex(self, item):
+        """Updates the indexes after the indexed attributes/keys of an item in the collection changed"""
+        self.remove(item)
+        self.add(item)
+    def __len__(self):
+        return len(self._items)
+    def __iter__(self):
+        return iter(list(itervalues(self._items)))
+    def __contains__(self, item):
+        return id(item) in self._items
+    def select(self, pred):
+        """Returns a list of the items matching the predicate, in the order they were added (or last reindexed)"""
+        candidates = self._get_candidates(pred)
+        if candidates is None:
+            return pred.filter(itervalues(self._items))
+        positions = self._positions
+        return pred.filter(sorted(candidates, key=lambda item: positions[id(item)]))
+    def _get_candidates(self, pred):
+        """Returns a list of the items which may match pred, or None if the indexes can't tell"""
+        if type(pred) is CompiledPredicate:
+            return self._get_candidates(pred._pred)
+        if type(pred) is Or:
+            branches = [self._get_candidates(p) for p in pred._preds]
+            if any(branch is None for branch in branches):
+                return None
+            returned = OrderedDict()
+            for branch in branches:
+                returned.update((id(item), item) for item in branch)
+            return list(itervalues(returned))
+        best = None
+        for buckets in self._get_condition_buckets(pred):
+            if best is None or sum(map(len, buckets)) < sum(map(len, best)):
+                best = buckets
+        if best is None:
+            return None
+        return [item for bucket in best for item in itervalues(bucket)]
+    def _get_condition_buckets(self, pred):
+        """Yields the candidate buckets of each indexed equality condition that items matching pred must meet"""
+        if type(pred) is And:
+            for p in pred._preds:
+                for buckets in self._get_condition_buckets(p):
+                    yield buckets
+            return
+        if type(pred) is CompiledPredicate:
+            conditions = list(self._get_condition_buckets(pred._pred))
+        elif type(pred) is Or:
+            candidates = self._get_candidates(pred)
+            conditions = [] if candidates is None else [[dict((id(item), item) for item in candidates)]]
+        elif type(pred) is ObjectAttributes:
+            conditions = self._get_index_buckets('attribute', pred._attributes)
+        elif type(pred) is DictionaryItems:
+            conditions = self._get_index_buckets('key', pred._items)
+        elif type(pred) is Equality:
+            conditions = self._get_index_buckets('item', {None: pred._obj})
+        else:
+            conditions = []
+        for buckets in conditions:
+            yield buckets
+    def _get_index_buckets(self, kind, values):
+        returned = []
+        for name, value in iteritems(values):
+            index = self._indexes.get((kind, name))
+            if index is not None:
+                buckets = index.get_candidates(value)
+                if buckets is not None:
+                    returned.append(buckets)
+        return returned
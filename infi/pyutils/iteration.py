@@ -1,27 +1,74 @@
-import itertools
+import collections
 from .python_compat import xrange
 
-_NOTHING = object()
-
-def iterate(collection):
-    iterator = enumerate(itertools.chain(iter(collection), [_NOTHING]))
-    prefetched = _NOTHING
-
-    while True:
-        index, element = next(iterator) if prefetched is _NOTHING else prefetched
-        if element is _NOTHING:
-            break
-        prefetched = next(iterator)
-        yield Iteration(
-            counter0 = index,
-            counter1 = index + 1,
-            first = (index == 0),
-            last  = prefetched[1] is _NOTHING
-            ), element
-
-class Iteration(object):
+try:
+    from collections.abc import Sequence as _Sequence
+except ImportError:
+    from collections import Sequence as _Sequence
+
+# collections whose len() is known to be the number of elements they iterate, besides sequences
+_SIZED_TYPES = frozenset([dict, set, frozenset, type({}.keys()), type({}.values()), type({}.items())])
+
+def iterate(collection, reuse_iteration=False):
+    """
+    Yields (iteration, element) pairs for the elements of collection, where iteration is an Iteration holding the
+    counters of the element and whether it is the first and/or last. For sequences (lists, tuples, strings, etc.),
+    dicts and sets, the last element is found through len() when iteration starts, so the collection shouldn't
+    change size while iterated; other iterables are prefetched one element ahead.
+    If reuse_iteration is True, a single MutableIteration is updated and yielded for all the elements instead of
+    creating an Iteration per element, so it is valid only until the next element is requested.
+    """
+    if type(collection) in _SIZED_TYPES or isinstance(collection, _Sequence):
+        return _iterate_sized(collection, reuse_iteration)
+    return _iterate_prefetching(iter(collection), reuse_iteration)
+
+def _iterate_sized(collection, reuse_iteration):
+    last_index = len(collection) - 1
+    if reuse_iteration:
+        iteration = MutableIteration(0, 1, True, False)
+        for index, element in enumerate(collection):
+            iteration.counter0 = index
+            iteration.counter1 = index + 1
+            iteration.first = index == 0
+            iteration.last = index == last_index
+            yield iteration, element
+    else:
+        new = tuple.__new__
+        for index, element in enumerate(collection):
+            yield new(Iteration, (index, index + 1, index == 0, index == last_index)), element
+
+def _iterate_prefetching(iterator, reuse_iteration):
+    for element in iterator:
+        break
+    else:
+        return
+    index = 0
+    if reuse_iteration:
+        iteration = MutableIteration(0, 1, True, False)
+        for next_element in iterator:
+            yield iteration, element
+            element = next_element
+            index += 1
+            iteration.counter0 = index
+            iteration.counter1 = index + 1
+            iteration.first = False
+        iteration.last = True
+        yield iteration, element
+    else:
+        new = tuple.__new__
+        for next_element in iterator:
+            yield new(Iteration, (index, index + 1, index == 0, False)), element
+            element = next_element
+            index += 1
+        yield new(Iteration, (index, index + 1, index == 0, True)), element
+
+class Iteration(collections.namedtuple('Iteration', ['counter0', 'counter1', 'first', 'last'])):
+    __slots__ = ()
+
+class MutableIteration(object):
+    __slots__ = ('counter0', 'counter1', 'first', 'last')
     def __init__(self, counter0, counter1, first, last):
-        super(Iteration, self).__init__()
+        super(MutableIteration, self).__init__()
         self.counter0 = counter0
         self.counter1 = counter1
         self.first = first
@@ -2,7 +2,7 @@
 import itertools
 import time
 from .decorators import wraps
-from .python_compat import iteritems
+from .function_signature import get_call_key_builder
 from logging import getLogger
 from types import MethodType, FunctionType
 
@@ -68,15 +68,30 @@ def _get_instancemethod_cache_entry(method_id, *args, **kwargs):
     except TypeError:
         return None
 
+def _get_call_cache_entry(call_key, prefix, args, kwargs):
+    try:
+        key = call_key(args, kwargs)
+        if key is None:
+            # invalid call - let the function raise
+            return None
+        key = prefix + key
+        hash(key)
+        return key
+    except TypeError:
+        return None
+
 def cached_method(func):
     """Decorator that caches a method's return value each time it is called.
     If called later with the same arguments, the cached value is returned, and
-    not re-evaluated.
+    not re-evaluated. Arguments are matched by value, regardless of how they are
+    passed: positionally, by keyword, or by omitting arguments with defaults.
     """
     method_id = next(_cached_method_id_allocator)
+    call_key = get_call_key_builder(func, is_method=True)
+    prefix = (method_id,)
     @wraps(func)
     def callee(inst, *args, **kwargs):
-        key = _get_instancemethod_cache_entry(method_id, *args, **kwargs)
+        key = _get_call_cache_entry(call_key, prefix, args, kwargs)
         if key is None:
             logger.debug("Passed arguments to {0} are mutable, so the returned value will not be cached".format(func.__name__))
             return func(inst, *args, **kwargs)
@@ -93,6 +108,7 @@ def cached_method(func):
 
     callee.__cached_method__ = True
     callee.__method_id__ = method_id
+    callee.__call_key__ = call_key
     return callee
 
 
@@ -132,17 +148,17 @@ class cached_method_with_custom_cache(object):
         callee.__method_id__ = method_id
         return callee
 
-def _get_function_cache_entry(args, kwargs):
-    return (tuple(args), frozenset(iteritems(kwargs)))
-
 def cached_function(func):
     """Decorator that caches a function's return value each time it is called.
     If called later with the same arguments, the cached value is returned, and
-    not re-evaluated.
+    not re-evaluated. Arguments are matched by value, as in cached_method.
     """
+    call_key = get_call_key_builder(func)
     @wraps(func)
     def callee(*args, **kwargs):
-        key = _get_function_cache_entry(args, kwargs)
+        key = _get_call_cache_entry(call_key, (), args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
         try:
             value = func._cache[key]
         except (KeyError, AttributeError):
@@ -154,6 +170,7 @@ def cached_function(func):
 
     callee._cache = func._cache = dict()
     callee.__cached_method__ = True
+    callee.__call_key__ = call_key
     return callee
 
 def clear_cache(self):
@@ -166,9 +183,13 @@ def clear_cached_entry(self, *args, **kwargs):
         self = getattr(method, 'im_self', getattr(method, '__self__', None))
         if self is None:
             return
-        key = _get_instancemethod_cache_entry(method.__method_id__, *args, **kwargs)
+        call_key = getattr(method, '__call_key__', None)
+        if call_key is None:
+            key = _get_instancemethod_cache_entry(method.__method_id__, *args, **kwargs)
+        else:
+            key = _get_call_cache_entry(call_key, (method.__method_id__,), args, kwargs)
     elif isinstance(self, FunctionType) and getattr(self, '__cached_method__', False):
-        key = _get_function_cache_entry(args, kwargs)
+        key = _get_call_cache_entry(self.__call_key__, (), args, kwargs)
     else:
         return
     _ = getattr(self, '_cache', {}).pop(key, None)
@@ -1,4 +1,6 @@
 import functools
+import inspect
+import weakref
 from .functors import Identity
 from .python_compat import get_underlying_function
 from .python_compat import create_bound_method
@@ -9,40 +11,153 @@ class MethodMap(object):
         super(MethodMap, self).__init__()
         self._map = {}
         self._decorate = decorator
+        self._tables = weakref.WeakKeyDictionary()
+        # the last (owner ref, table) pair looked up, since looking up a WeakKeyDictionary is relatively slow. It is
+        # replaced as a whole, so concurrent readers never pair one owner with the table of another
+        self._last = None
     def registering(self, key):
         return functools.partial(self.register, key)
     def register(self, key, value):
         self._map[key] = self._decorate(value)
+        self._invalidate()
         return value
+    def _invalidate(self):
+        self._tables.clear()
+        self._last = None
+    def get_dispatch_table(self, owner):
+        """
+        Returns the dispatch table of the map for the given owner class: a dict mapping each key to a
+        (function, binding) pair, or to None if the key isn't mapped. Static and class methods are unwrapped, and
+        binding tells what the function is called with before the call's arguments: nothing (BIND_NONE), the
+        instance (BIND_INSTANCE) or the owner class (BIND_CLASS). The table holds no reference to owner, so owner
+        classes can still be collected. It is built once per owner, and rebuilt after new registrations
+        """
+        last = self._last
+        if last is not None and last[0]() is owner:
+            return last[1]
+        table = self._tables.get(owner)
+        if table is None:
+            table = self._tables[owner] = self._build_dispatch_table(owner)
+        self._last = (weakref.ref(owner), table)
+        return table
     def __get__(self, instance, owner):
-        return Binder(self._map, instance)
+        last = self._last
+        if last is not None and last[0]() is owner:
+            return Binder(last[1], instance, owner)
+        return Binder(self.get_dispatch_table(owner), instance, owner)
+    def _build_dispatch_table(self, owner):
+        return _DispatchTable((key, _resolve(function)) for key, function in self._map.items())
+
+class TypeMethodMap(MethodMap):
+    """
+    A MethodMap keyed by types. Looking up a type that isn't registered returns the entry of the first registered
+    type in its MRO, like functools.singledispatch does (but without considering abstract base classes), and the
+    result is cached, so later lookups of the type are a single dict lookup. The cache is dropped on registration.
+    A subclass of the owner class may declare a TypeMethodMap of the same name: the registrations of both are
+    merged, those of the subclass taking precedence::
+
+        class Handler(object):
+            HANDLERS = TypeMethodMap()
+            @HANDLERS.registering(Exception)
+            def _handle_exception(self, message):
+                ...
+        class SpecificHandler(Handler):
+            HANDLERS = TypeMethodMap()
+            @HANDLERS.registering(ValueError)
+            def _handle_value_error(self, message):
+                ...
+
+        SpecificHandler().HANDLERS.dispatch(type(message), message)
+    """
+    def __init__(self, decorator=Identity):
+        super(TypeMethodMap, self).__init__(decorator)
+        # the maps of subclasses that merged our registrations into their tables
+        self._dependents = weakref.WeakKeyDictionary()
+    def _invalidate(self):
+        super(TypeMethodMap, self)._invalidate()
+        for dependent in list(self._dependents):
+            dependent._invalidate()
+    def _build_dispatch_table(self, owner):
+        registrations = {}
+        for method_map in self._get_inherited_maps(owner):
+            if method_map is not self:
+                method_map._dependents[self] = None
+            registrations.update(method_map._map)
+        return _TypeDispatchTable((key, _resolve(function)) for key, function in registrations.items())
+    def _get_inherited_maps(self, owner):
+        """Returns the TypeMethodMaps declared under our name along the MRO of owner, base classes first"""
+        mro = inspect.getmro(owner)
+        for cls in mro:
+            for name, value in vars(cls).items():
+                if value is self:
+                    maps = [vars(base).get(name) for base in reversed(mro)]
+                    return [method_map for method_map in maps if isinstance(method_map, TypeMethodMap)]
+        return [self]
+
+class _DispatchTable(dict):
+    def __missing__(self, key):
+        return None
+
+class _TypeDispatchTable(_DispatchTable):
+    def __init__(self, entries):
+        super(_TypeDispatchTable, self).__init__(entries)
+        self._registered = dict(self)
+    def __missing__(self, key):
+        returned = None
+        if inspect.isclass(key):
+            for base in inspect.getmro(key):
+                returned = self._registered.get(base)
+                if returned is not None:
+                    break
+        self[key] = returned
+        return returned
+
+BIND_NONE, BIND_INSTANCE, BIND_CLASS = range(3)
+
+def _resolve(function):
+    if isinstance(function, staticmethod):
+        return get_underlying_function(function), BIND_NONE
+    if isinstance(function, classmethod):
+        return get_underlying_function(function), BIND_CLASS
+    return function, BIND_INSTANCE
 
 _NOTHING = object()
 
 class Binder(object):
-    def __init__(self, map, instance):
-        super(Binder, self).__init__()
-        self._map = map
+    __slots__ = ('_table', '_instance', '_owner')
+    def __init__(self, table, instance, owner):
+        # no super().__init__() call, as binders are created on every access to the map
+        self._table = table
         self._instance = instance
+        self._owner = owner
     def get(self, key, default=None):
-        if key not in self._map:
+        entry = self._table[key]
+        if entry is None:
             return default
-        function = self._map[key]
-        if isinstance(function, staticmethod):
-            return get_underlying_function(function)
-        if isinstance(function, classmethod):
-            returned_self = self._instance
-            function = get_underlying_function(function)
-        else:
-            returned_self = self._instance.__class__
-        return create_bound_method(
-            function,
-            returned_self,
-            )
-        return self._map[key]
+        function, binding = entry
+        if binding == BIND_CLASS:
+            return create_bound_method(function, self._owner)
+        if binding == BIND_NONE or self._instance is None:
+            return function
+        return create_bound_method(function, self._instance)
     def __getitem__(self, key):
         returned = self.get(key, _NOTHING)
         if returned is _NOTHING:
             raise LookupError(key)
         return returned
-
+    def dispatch(self, key, *args):
+        """
+        Calls the function mapped to key with the given arguments, without creating a bound method. Raises KeyError
+        if key isn't mapped. When the map is accessed through the class, methods are called with the arguments as
+        they are, like unbound methods
+        """
+        entry = self._table[key]
+        if entry is None:
+            raise KeyError(key)
+        function, binding = entry
+        if binding == BIND_INSTANCE:
+            if self._instance is not None:
+                return function(self._instance, *args)
+        elif binding == BIND_CLASS:
+            return function(self._owner, *args)
+        return function(*args)
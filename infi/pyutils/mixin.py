@@ -33,10 +33,21 @@ request = HttpRequest(...)
 ...
 
 install_mixin(request, UserAuth)
+
+The shadow class of an object depends only on its original class and the set of mixins installed on it, not on the
+order they were installed in, so objects with the same mixins share a class. Within the shadow class, a mixin comes
+before (and so overrides) the mixins it inherits from, and otherwise mixins with a higher ``__mixin_priority__``
+(a class attribute, 0 by default) come first, and mixins of the same priority are ordered by their module and name::
+
+class AuditedUserAuth(UserAuth):
+    __mixin_priority__ = 10
 """
-from .lazy import cached_function
+import sys
+import threading
+import weakref
+from collections import deque, namedtuple
 
-__all__ = [ "install_mixin", "install_mixin_if" ]
+__all__ = [ "install_mixin", "install_mixin_if", "install_mixins", "get_shadow_class_report" ]
 
 def install_mixin_if(obj, mixin, condition):
     """
@@ -49,21 +60,112 @@ def install_mixin_if(obj, mixin, condition):
 def install_mixin(obj, mixin):
     obj.__class__ = _replace_class(type(obj), mixin)
 
-@cached_function
+def install_mixins(objs, *mixins):
+    """
+    Same as calling install_mixin(obj, mixin) for each of the objects with each of the mixins in turn, but the
+    shadow class is looked up once per distinct class of the objects, and is made with all the mixins at once.
+    """
+    shadow_classes = {}
+    for obj in objs:
+        cls = type(obj)
+        shadow_cls = shadow_classes.get(cls)
+        if shadow_cls is None:
+            shadow_cls = shadow_classes[cls] = _get_shadow_class(cls, mixins)
+        if shadow_cls is not cls:
+            obj.__class__ = shadow_cls
+
+class _ShadowClassCache(object):
+    """
+    Maps (real class, mixins) to the shadow class made for them. Shadow classes are held weakly, so a shadow class
+    that is no longer used by any object can be collected, except for the *max_recent* most recently created ones,
+    which are kept alive to spare recreating them when mixins are installed on short-lived objects.
+    Creation is done under a lock, so at most one shadow class exists for each key at any time.
+    """
+    def __init__(self, max_recent=256):
+        super(_ShadowClassCache, self).__init__()
+        self._lock = threading.RLock()
+        self._classes = weakref.WeakValueDictionary()
+        self._recent = deque(maxlen=max_recent)
+    def get(self, key, create):
+        returned = self._classes.get(key)
+        if returned is not None:
+            return returned
+        with self._lock:
+            returned = self._classes.get(key)
+            if returned is None:
+                returned = self._classes[key] = create()
+                self._recent.append(returned)
+        return returned
+    def __len__(self):
+        return len(self._classes)
+    def get_classes(self):
+        with self._lock:
+            return [cls for cls in self._classes.values() if cls is not None]
+
+_shadow_classes = _ShadowClassCache()
+# (class, mixins installed on it) -> the resulting shadow class, to skip canonicalizing the mixins on every install
+_installed_classes = weakref.WeakValueDictionary()
+
 def _replace_class(cls, mixin):
+    return _get_shadow_class(cls, (mixin,))
+
+def _get_shadow_class(cls, mixins):
+    returned = _installed_classes.get((cls, mixins))
+    if returned is None:
+        returned = _find_shadow_class(cls, mixins)
+        if returned is not cls:
+            # a class can't be weakly mapped from a key holding it
+            _installed_classes[cls, mixins] = returned
+    return returned
+
+def _find_shadow_class(cls, mixins):
     if hasattr(cls, '__mixins__'):
         # This is already a shadow class.
-        if mixin in cls.__mixins__:
-            # We already added this mixin.
-            return cls
         real_cls = cls.__real_class__
-        mixins = [ mixin ] + cls.__mixins__
+        installed = cls.__mixins__
     else:
         real_cls = cls
-        mixins = [ mixin ]
-        
+        installed = []
+    new_mixins = [mixin for mixin in mixins if mixin not in installed]
+    if not new_mixins:
+        return cls
+    # The shadow class is keyed by its real class and the canonical order of all of its mixins, so there is one
+    # shadow class for each set of mixins
+    all_mixins = _get_canonical_order(set(new_mixins).union(installed))
+    return _shadow_classes.get((real_cls, all_mixins), lambda: _create_shadow_class(real_cls, list(all_mixins)))
+
+def _get_canonical_order(mixins):
+    remaining = sorted(mixins, key=lambda mixin: (-getattr(mixin, '__mixin_priority__', 0), mixin.__module__,
+                                                  mixin.__name__, id(mixin)))
+    returned = []
+    while remaining:
+        # The first mixin which none of the others inherit from, so the MRO stays consistent
+        index = next(index for index, mixin in enumerate(remaining)
+                     if not any(other is not mixin and issubclass(other, mixin) for other in remaining))
+        returned.append(remaining.pop(index))
+    return tuple(returned)
+
+def _create_shadow_class(real_cls, mixins):
     name = "%s[%s]" % (real_cls.__name__, ", ".join([ m.__name__  for m in mixins ]))
     bases = mixins + [ real_cls ]
     result_cls = type(name, tuple(bases), dict(__real_class__=real_cls, __mixins__=mixins))
     result_cls.__module__ = real_cls.__module__
     return result_cls
+
+ShadowClassInfo = namedtuple('ShadowClassInfo', ['shadow_class', 'real_class', 'mixins', 'size'])
+ShadowClassReport = namedtuple('ShadowClassReport', ['num_classes', 'total_size', 'classes'])
+
+def get_shadow_class_report():
+    """
+    Returns a ShadowClassReport of the shadow classes that currently exist: their number, their approximate total
+    size in bytes and a ShadowClassInfo for each, largest first. A class's size counts the type object, its
+    dictionary and its MRO tuple, not the mixins or the real class
+    """
+    classes = [ShadowClassInfo(cls, cls.__real_class__, tuple(cls.__mixins__), _get_class_size(cls))
+               for cls in _shadow_classes.get_classes()]
+    classes.sort(key=lambda info: info.size, reverse=True)
+    return ShadowClassReport(len(classes), sum(info.size for info in classes), classes)
+
+def _get_class_size(cls):
+    return (sys.getsizeof(cls) + sys.getsizeof(dict(cls.__dict__)) + sys.getsizeof(cls.__mro__) +
+            sys.getsizeof(cls.__mixins__))
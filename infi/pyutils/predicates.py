@@ -2,8 +2,14 @@ import operator
 import functools
 from .functors.functor import Functor
 from .functors.always import Always
+from .enums import Value
 from .python_compat import iteritems
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 class Predicate(Functor):
     def __init__(self, func=None):
         super(Predicate, self).__init__()
@@ -12,6 +18,42 @@ class Predicate(Functor):
         return self._func(*args, **kwargs)
     def __repr__(self):
         return "<Predicate {0!r}>".format(self._func or "?")
+    def compile(self):
+        """
+        Returns an equivalent predicate of a single argument, evaluating the whole predicate tree in one generated
+        function: And, Or, Not and the built-in leaf predicates are inlined as short-circuiting expressions,
+        and any other callable is called directly. The compiled predicate always returns True or False
+        """
+        return CompiledPredicate(self)
+    def filter(self, iterable):
+        """Returns a list of the items of iterable matching the predicate, evaluating it in its compiled form"""
+        compiled = self.__dict__.get('_compiled')
+        if compiled is None:
+            compiled = self._compiled = self.compile()
+        func = compiled._func
+        return [item for item in iterable if func(item)]
+    def mask(self, columns):
+        """
+        Evaluates the predicate over columnar data: `columns` maps names to equally-sized sequences (lists or NumPy
+        arrays), row i being the record whose attributes/items are the i'th values of the columns. Returns a mask of
+        the matching rows, a boolean NumPy array if any of the columns is an array and a list of bools otherwise.
+        ObjectAttributes and DictionaryItems compare whole columns at once, and And, Or and Not combine their
+        children's masks. Other predicates are called on each row, which supports both getattr and indexing. As
+        in filter(), they are only called on the rows that the earlier children of an And/Or left undecided
+        """
+        return _ColumnarEvaluator(columns).mask(self)
+    def simplify(self, samples=None):
+        """
+        Returns an equivalent, simplified predicate: nested And/Or are flattened, AlwaysTrue/AlwaysFalse are folded,
+        double negations are removed and duplicate children are dropped. The children of each And/Or are then
+        reordered so that cheap predicates that are likely to decide the result come first: by estimated cost, and
+        if `samples` (items the predicate is typically evaluated on) are given, by the fraction of the samples each
+        child accepts. Without samples, no child is moved across one that calls an arbitrary function, as such a
+        child may guard the ones after it (e.g. from raising on None). With samples, reordering assumes that
+        children have no side effects and don't rely on earlier children to guard them; an And/Or whose children
+        raise on a sample keeps its order
+        """
+        return _Simplifier(samples).simplify(self)
 
 AlwaysTrue = Predicate(Always(True))
 AlwaysFalse = Predicate(Always(False))
@@ -87,3 +129,379 @@ class DictionaryItems(Predicate):
                 '[{0!r}]=={1!r}'.format(key, value) for key, value in iteritems(self._items)
                 )
             )
+
+class CompiledPredicate(Predicate):
+    def __init__(self, pred):
+        if isinstance(pred, CompiledPredicate):
+            pred = pred._pred
+        compiler = _PredicateCompiler()
+        super(CompiledPredicate, self).__init__(compiler.compile(pred))
+        self._pred = pred
+        self._source = compiler.source
+    def __call__(self, obj):
+        return self._func(obj)
+    def compile(self):
+        return self
+    def simplify(self, samples=None):
+        return self._pred.simplify(samples).compile()
+    def __repr__(self):
+        return "<compiled {0!r}>".format(self._pred)
+
+class _PredicateCompiler(object):
+    """
+    Generates the source of a function evaluating a predicate tree on a single argument named obj. Every predicate
+    is turned into a Python expression. Objects referenced by the expressions (values, callables) are bound as
+    globals of the generated code. Only predicates of the exact types below are inlined, so subclasses that override
+    __call__ are still called as they are.
+    """
+    _MAX_EXPRESSION_DEPTH = 30
+    def __init__(self):
+        super(_PredicateCompiler, self).__init__()
+        self._namespace = {'MISSING': _MISSING}
+        self._functions = []
+        self._num_names = 0
+        self.source = None
+    def compile(self, pred):
+        self._add_function('predicate', "return True if {0} else False".format(self._get_expression(pred, 0)))
+        self.source = "\n".join(self._functions)
+        exec(compile(self.source, "<predicate>", "exec"), self._namespace)
+        return self._namespace['predicate']
+    def _add_function(self, name, body_lines):
+        if not isinstance(body_lines, list):
+            body_lines = [body_lines]
+        self._functions.append("\n".join(["def {0}(obj):".format(name)] + ["    " + line for line in body_lines]))
+    def _new_name(self, prefix):
+        self._num_names += 1
+        return "{0}{1}".format(prefix, self._num_names)
+    def _bind(self, value):
+        name = self._new_name("V")
+        self._namespace[name] = value
+        return name
+    def _get_expression(self, pred, depth):
+        if depth > self._MAX_EXPRESSION_DEPTH:
+            # deeply nested expressions may exceed the parser's limits, so the subtree becomes a function of its own
+            name = self._new_name("F")
+            self._add_function(name, "return {0}".format(self._get_expression(pred, 0)))
+            return "{0}(obj)".format(name)
+        compile_method = self._COMPILERS.get(type(pred))
+        if compile_method is None:
+            return "{0}(obj)".format(self._bind(pred))
+        return compile_method(self, pred, depth + 1)
+    def _compile_predicate(self, pred, depth):
+        if type(pred._func) is Always:
+            return self._bind(pred._func(None))
+        return "{0}(obj)".format(self._bind(pred._func))
+    def _compile_and(self, pred, depth):
+        return "({0})".format(" and ".join(self._get_expression(p, depth) for p in pred._preds) or "True")
+    def _compile_or(self, pred, depth):
+        return "({0})".format(" or ".join(self._get_expression(p, depth) for p in pred._preds) or "False")
+    def _compile_not(self, pred, depth):
+        return "(not {0})".format(self._get_expression(pred._pred, depth))
+    def _compile_compiled(self, pred, depth):
+        return self._get_expression(pred._pred, depth - 1)
+    def _compile_identity(self, pred, depth):
+        return "({0} is obj)".format(self._bind(pred._obj))
+    def _compile_equality(self, pred, depth):
+        return "({0} == obj)".format(self._bind(pred._obj))
+    def _compile_object_attributes(self, pred, depth):
+        return "({0})".format(" and ".join("getattr(obj, {0!r}, MISSING) == {1}".format(attr, self._bind(value))
+                                           for attr, value in iteritems(pred._attributes)) or "True")
+    def _compile_dictionary_items(self, pred, depth):
+        if not pred._items:
+            return "True"
+        # item lookups may raise LookupError, which an expression can't catch
+        name = self._new_name("F")
+        self._add_function(name, ["try:",
+                                  "    return not ({0})".format(" or ".join(
+                                      "obj[{0}] != {1}".format(self._bind(key), self._bind(value))
+                                      for key, value in iteritems(pred._items))),
+                                  "except LookupError:",
+                                  "    return False"])
+        return "{0}(obj)".format(name)
+    _COMPILERS = {
+        Predicate: _compile_predicate,
+        And: _compile_and,
+        Or: _compile_or,
+        Not: _compile_not,
+        CompiledPredicate: _compile_compiled,
+        Identity: _compile_identity,
+        Equality: _compile_equality,
+        ObjectAttributes: _compile_object_attributes,
+        DictionaryItems: _compile_dictionary_items,
+        }
+
+class _ColumnarRow(object):
+    def __init__(self, columns, index):
+        super(_ColumnarRow, self).__init__()
+        self._columns = columns
+        self._index = index
+    def __getitem__(self, name):
+        return self._columns[name][self._index]
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._columns:
+            raise AttributeError(name)
+        return self._columns[name][self._index]
+    def __repr__(self):
+        return "<row {0}>".format(self._index)
+
+class _ColumnarEvaluator(object):
+    def __init__(self, columns):
+        super(_ColumnarEvaluator, self).__init__()
+        self._columns = columns
+        lengths = set(len(column) for column in columns.values())
+        if len(lengths) > 1:
+            raise ValueError("Columns are of different lengths: {0}".format(sorted(lengths)))
+        self._length = lengths.pop() if lengths else 0
+        self._use_numpy = numpy is not None and any(isinstance(column, numpy.ndarray) for column in columns.values())
+    def mask(self, pred):
+        returned = self._get_mask(pred)
+        if self._use_numpy:
+            return numpy.asarray(returned, dtype=bool)
+        return list(returned)
+    def _get_mask(self, pred, rows=None):
+        """
+        Returns the mask of pred over the given row indexes (all rows if None). The values of the other rows are
+        unspecified - they are rows that an And/Or above pred already decided
+        """
+        get_mask = self._MASKERS.get(type(pred))
+        if get_mask is None:
+            return self._get_row_mask(pred, rows)
+        return get_mask(self, pred, rows)
+    def _get_row_mask(self, func, rows):
+        if rows is None:
+            return [bool(func(_ColumnarRow(self._columns, index))) for index in range(self._length)]
+        returned = [False] * self._length
+        for index in rows:
+            returned[index] = bool(func(_ColumnarRow(self._columns, index)))
+        return returned
+    def _is_vectorized(self, pred):
+        """Returns whether the mask of pred is computed without calling anything on the rows"""
+        pred_type = type(pred)
+        if pred_type is ObjectAttributes or pred_type is DictionaryItems:
+            return True
+        if pred_type is Predicate:
+            return type(pred._func) is Always
+        if pred_type is And or pred_type is Or:
+            return all(self._is_vectorized(p) for p in pred._preds)
+        if pred_type is Not or pred_type is CompiledPredicate:
+            return self._is_vectorized(pred._pred)
+        return False
+    def _get_constant_mask(self, value):
+        return [bool(value)] * self._length
+    def _get_equality_mask(self, name, value):
+        column = self._columns.get(name, _MISSING)
+        if column is _MISSING:
+            return self._get_constant_mask(False)
+        if numpy is not None and isinstance(column, numpy.ndarray):
+            returned = column == value
+            if isinstance(returned, numpy.ndarray) and returned.shape == column.shape:
+                return returned
+        return [True if item == value else False for item in column]
+    def _get_items_mask(self, items):
+        return self._combine_all([self._get_equality_mask(name, value) for name, value in iteritems(items)])
+    def _combine_all(self, masks):
+        if not masks:
+            return self._get_constant_mask(True)
+        returned = masks[0]
+        for mask in masks[1:]:
+            if self._use_numpy:
+                returned = numpy.logical_and(returned, mask)
+            else:
+                returned = [a and b for a, b in zip(returned, mask)]
+        return returned
+    def _combine_any(self, masks):
+        if not masks:
+            return self._get_constant_mask(False)
+        returned = masks[0]
+        for mask in masks[1:]:
+            if self._use_numpy:
+                returned = numpy.logical_or(returned, mask)
+            else:
+                returned = [a or b for a, b in zip(returned, mask)]
+        return returned
+    def _mask_predicate(self, pred, rows):
+        if type(pred._func) is Always:
+            return self._get_constant_mask(pred._func(None))
+        return self._get_row_mask(pred._func, rows)
+    def _mask_aggregate(self, pred, rows, combine, undecided):
+        # rows in which the children so far are all `undecided` (True for And, False for Or) are still undecided
+        returned = None
+        for p in pred._preds:
+            child_rows = rows
+            if returned is not None and not self._is_vectorized(p):
+                child_rows = [index for index in (range(self._length) if rows is None else rows)
+                              if bool(returned[index]) is undecided]
+            mask = self._get_mask(p, child_rows)
+            returned = mask if returned is None else combine([returned, mask])
+        return self._get_constant_mask(undecided) if returned is None else returned
+    def _mask_and(self, pred, rows):
+        return self._mask_aggregate(pred, rows, self._combine_all, True)
+    def _mask_or(self, pred, rows):
+        return self._mask_aggregate(pred, rows, self._combine_any, False)
+    def _mask_not(self, pred, rows):
+        mask = self._get_mask(pred._pred, rows)
+        if self._use_numpy:
+            return numpy.logical_not(mask)
+        return [not value for value in mask]
+    def _mask_compiled(self, pred, rows):
+        return self._get_mask(pred._pred, rows)
+    def _mask_object_attributes(self, pred, rows):
+        return self._get_items_mask(pred._attributes)
+    def _mask_dictionary_items(self, pred, rows):
+        return self._get_items_mask(pred._items)
+    _MASKERS = {
+        Predicate: _mask_predicate,
+        And: _mask_and,
+        Or: _mask_or,
+        Not: _mask_not,
+        CompiledPredicate: _mask_compiled,
+        ObjectAttributes: _mask_object_attributes,
+        DictionaryItems: _mask_dictionary_items,
+        }
+
+class _Simplifier(object):
+    _MAX_SELECTIVITY = 0.99
+    def __init__(self, samples):
+        super(_Simplifier, self).__init__()
+        self._samples = None if samples is None else list(samples)
+    def simplify(self, pred):
+        simplify = self._SIMPLIFIERS.get(type(pred))
+        return pred if simplify is None else simplify(self, pred)
+    def _simplify_not(self, pred):
+        child = self.simplify(pred._pred)
+        if type(child) is Not:
+            return child._pred
+        constant = _get_constant(child)
+        if constant is not None:
+            return AlwaysFalse if constant else AlwaysTrue
+        return pred if child is pred._pred else Not(child)
+    def _simplify_aggregate(self, pred):
+        aggregate_type = type(pred)
+        # the constant that decides the result (AlwaysFalse for And) and the neutral one (AlwaysTrue for And)
+        deciding = aggregate_type is Or
+        children = []
+        keys = set()
+        pending = list(reversed(pred._preds))
+        while pending:
+            child = self.simplify(pending.pop())
+            if type(child) is aggregate_type:
+                pending.extend(reversed(child._preds))
+                continue
+            constant = _get_constant(child)
+            if constant is not None:
+                if constant == deciding:
+                    return AlwaysTrue if deciding else AlwaysFalse
+                continue
+            key = _get_structure_key(child)
+            if key not in keys:
+                keys.add(key)
+                children.append(child)
+        if not children:
+            return AlwaysFalse if deciding else AlwaysTrue
+        if len(children) == 1:
+            return children[0]
+        return aggregate_type(*self._reorder(children, deciding))
+    def _reorder(self, children, deciding):
+        if not self._samples:
+            # children calling arbitrary functions stay in place, and the others are only reordered between them
+            returned = []
+            run = []
+            for child in children:
+                if _calls_function(child):
+                    returned.extend(self._sort(run, [0.5] * len(run), deciding))
+                    returned.append(child)
+                    run = []
+                else:
+                    run.append(child)
+            returned.extend(self._sort(run, [0.5] * len(run), deciding))
+            return returned
+        try:
+            probabilities = [sum(1 for sample in self._samples if child(sample)) / float(len(self._samples))
+                             for child in children]
+        except Exception:
+            return children
+        return self._sort(children, probabilities, deciding)
+    def _sort(self, children, probabilities, deciding):
+        def _get_rank(index):
+            # the expected cost of reaching a decision through children[index]: And children are ranked by
+            # cost / P(false), Or children by cost / P(true)
+            probability = probabilities[index] if deciding else 1 - probabilities[index]
+            probability = max(min(probability, self._MAX_SELECTIVITY), 1 - self._MAX_SELECTIVITY)
+            return _estimate_cost(children[index]) / probability
+        return [children[index] for index in sorted(range(len(children)), key=_get_rank)]
+    _SIMPLIFIERS = {
+        And: _simplify_aggregate,
+        Or: _simplify_aggregate,
+        Not: _simplify_not,
+        }
+
+def _get_constant(pred):
+    if type(pred) is Predicate and type(pred._func) is Always:
+        return bool(pred._func(None))
+    return None
+
+def _is_indexable(value):
+    """Returns whether value can be looked up by hash: it is hashable, and values equal to it hash the same"""
+    if isinstance(value, Value):
+        # enum Values compare equal to any of their aliases, in any case, but hash by their key
+        return False
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+def _get_value_key(key, pred, values):
+    # equal keys must imply equivalent predicates, so values that can't be compared by hash make pred unique
+    if all(_is_indexable(value) for value in values):
+        return key
+    return ('object', id(pred))
+
+def _get_structure_key(pred):
+    pred_type = type(pred)
+    if pred_type is Identity:
+        return ('is', id(pred._obj))
+    if pred_type is Equality:
+        return _get_value_key(('==', pred._obj), pred, [pred._obj])
+    if pred_type is ObjectAttributes:
+        return _get_value_key(('attributes', frozenset(iteritems(pred._attributes))), pred, pred._attributes.values())
+    if pred_type is DictionaryItems:
+        return _get_value_key(('items', frozenset(iteritems(pred._items))), pred, pred._items.values())
+    if pred_type is Not:
+        return ('not', _get_structure_key(pred._pred))
+    if pred_type in (And, Or):
+        return (pred_type.__name__, tuple(_get_structure_key(p) for p in pred._preds))
+    if pred_type is Predicate and pred._func is not None:
+        return ('call', id(pred._func))
+    return ('object', id(pred))
+
+def _calls_function(pred):
+    """Returns whether evaluating pred may call a function other than the built-in predicates"""
+    pred_type = type(pred)
+    if pred_type in (Identity, Equality, ObjectAttributes, DictionaryItems) or _get_constant(pred) is not None:
+        return False
+    if pred_type in (Not, CompiledPredicate):
+        return _calls_function(pred._pred)
+    if pred_type in (And, Or):
+        return any(_calls_function(p) for p in pred._preds)
+    return True
+
+_UNKNOWN_COST = 10
+
+def _estimate_cost(pred):
+    pred_type = type(pred)
+    if pred_type in (Identity, Equality):
+        return 1
+    if pred_type is ObjectAttributes:
+        return 1 + len(pred._attributes)
+    if pred_type is DictionaryItems:
+        return 2 + len(pred._items)
+    if pred_type is Not:
+        return 1 + _estimate_cost(pred._pred)
+    if pred_type in (And, Or):
+        return sum(_estimate_cost(p) for p in pred._preds)
+    if pred_type is CompiledPredicate:
+        return _estimate_cost(pred._pred)
+    if _get_constant(pred) is not None:
+        return 0
+    return _UNKNOWN_COST
@@ -1,5 +1,11 @@
 import sys
+import time
+import random
+import functools
+import weakref
 import logging
+import threading
+from collections import namedtuple
 from six import reraise
 from contextlib import contextmanager
 
@@ -8,7 +14,11 @@ _logger = logging.getLogger(__name__)
 class InvalidReferenceCount(Exception):
     pass
 
+class DependencyCycle(Exception):
+    pass
+
 class ReferenceCounter(object):
+    _dependency_executor = None
     def __init__(self):
         super(ReferenceCounter, self).__init__()
         self._reference = 0
@@ -20,21 +30,44 @@ class ReferenceCounter(object):
         self._reference += 1
         try:
             if self._reference == 1:
-                self._increase_dependents()
-                try:
-                    self._on_reference_first_added()
-                except:
-                    self._decrease_dependents()
-                    raise
+                self._activate()
         except:
             self._reference -= 1
             raise
+        if _tracer is not None:
+            _tracer.on_add_reference(self)
     def depend_on_counter(self, counter):
+        _check_for_dependency_cycle(self, counter)
         if self._reference > 0:
             counter.add_reference()
         self._depends_on.append(counter)
+    def set_dependency_executor(self, executor):
+        """
+        Activates the dependencies of this counter in parallel on `executor` (e.g. a
+        concurrent.futures.ThreadPoolExecutor) when its first reference is added: the inactive counters it
+        (transitively) depends on are activated in topological order, each batch of independent counters
+        concurrently. Only the executor of the counter receiving the reference is used, so nested
+        activations never wait on the pool. As counters of the same batch may share dependencies, this requires
+        every counter it (transitively) depends on to be a ThreadSafeReferenceCounter; otherwise the dependencies
+        are activated sequentially, as if no executor was set.
+        """
+        self._dependency_executor = executor
+    def _activate(self):
+        self._increase_dependents()
+        try:
+            self._on_reference_first_added()
+        except:
+            self._decrease_dependents()
+            raise
     def _increase_dependents(self):
-        self._for_each_dependent(_ADDREF, rollback=_DECREF)
+        if self._dependency_executor is None or not _are_thread_safe(self._depends_on):
+            self._for_each_dependent(_ADDREF, rollback=_DECREF)
+            return
+        warmed = _activate_in_parallel(self._depends_on, self._dependency_executor)
+        try:
+            self._for_each_dependent(_ADDREF, rollback=_DECREF)
+        finally:
+            _release_all(warmed)
     def _decrease_dependents(self):
         self._for_each_dependent(_DECREF, rollback=_ADDREF)
     def _for_each_dependent(self, action, rollback):
@@ -58,17 +91,22 @@ class ReferenceCounter(object):
             except:
                 self._reference += 1
                 raise
+        if _tracer is not None:
+            _tracer.on_remove_reference(self)
+        if self._reference == 0:
             self._decrease_dependents()
-            thrown = None
-            for callback in list(self._zero_refcount_callbacks):
-                try:
-                    callback(self)
-                except BaseException:
-                    _logger.debug("Exception caught during remove_reference", exc_info=True)
-                    if thrown is None:
-                        thrown = sys.exc_info()
-            if thrown is not None:
-                reraise(*thrown)
+            self._call_zero_refcount_callbacks()
+    def _call_zero_refcount_callbacks(self):
+        thrown = None
+        for callback in list(self._zero_refcount_callbacks):
+            try:
+                callback(self)
+            except BaseException:
+                _logger.debug("Exception caught during remove_reference", exc_info=True)
+                if thrown is None:
+                    thrown = sys.exc_info()
+        if thrown is not None:
+            reraise(*thrown)
 
     @contextmanager
     def get_reference_context(self):
@@ -84,5 +122,368 @@ class ReferenceCounter(object):
     def _on_reference_last_dropped(self):
         pass
 
+class ThreadSafeReferenceCounter(ReferenceCounter):
+    """
+    A reference counter that can be shared between threads. The 0->1 and 1->0 transitions (including the
+    _on_reference_first_added/_on_reference_last_dropped hooks and dependency propagation) are serialized:
+    threads adding or removing references while a transition is in progress wait for it to finish, so e.g.
+    a thread acquiring a reference never sees the resource before _on_reference_first_added returned.
+    The lock itself is held only while updating the count, never while running hooks.
+    """
+    def __init__(self):
+        super(ThreadSafeReferenceCounter, self).__init__()
+        self._condition = threading.Condition(threading.Lock())
+        self._in_transition = False
+    def _begin_transition(self):
+        # must be called with the lock held
+        while self._in_transition:
+            self._condition.wait()
+    def _end_transition(self, reference_delta=0):
+        with self._condition:
+            self._reference += reference_delta
+            self._in_transition = False
+            self._condition.notify_all()
+    def add_reference(self):
+        with self._condition:
+            self._begin_transition()
+            self._reference += 1
+            activate = self._reference == 1
+            if activate:
+                self._in_transition = True
+        if activate:
+            try:
+                self._activate()
+            except:
+                self._end_transition(-1)
+                raise
+            self._end_transition()
+        if _tracer is not None:
+            _tracer.on_add_reference(self)
+    def depend_on_counter(self, counter):
+        _check_for_dependency_cycle(self, counter)
+        with self._condition:
+            self._begin_transition()
+            if self._reference == 0:
+                self._depends_on.append(counter)
+                return
+            self._in_transition = True
+        try:
+            counter.add_reference()
+            self._depends_on.append(counter)
+        finally:
+            self._end_transition()
+    def remove_reference(self):
+        with self._condition:
+            self._begin_transition()
+            if self._reference <= 0:
+                raise InvalidReferenceCount()
+            self._reference -= 1
+            release = self._reference == 0
+            if release:
+                self._in_transition = True
+        if release:
+            try:
+                self._on_reference_last_dropped()
+            except:
+                self._end_transition(1)
+                raise
+            try:
+                self._decrease_dependents()
+            finally:
+                self._end_transition()
+        if _tracer is not None:
+            _tracer.on_remove_reference(self)
+        if release:
+            self._call_zero_refcount_callbacks()
+
+class LingeringReferenceCounter(ThreadSafeReferenceCounter):
+    """
+    A thread-safe reference counter that keeps its resource warm for a grace period after the last reference
+    is dropped. _on_reference_last_dropped (followed by dependency release and the zero refcount callbacks)
+    is scheduled to run after `linger` seconds, and cancelled if a new reference arrives first, in which case
+    _on_reference_first_added is not called again.
+    By default the release runs on a threading.Timer. `call_later` can be used instead, e.g. an asyncio loop's
+    call_later: it is called with (delay, callback) and should return a handle with a cancel() method.
+    If the deferred _on_reference_last_dropped raises, the error is logged and the resource stays warm until
+    it is reused or released explicitly with release_lingering().
+    """
+    def __init__(self, linger, call_later=None):
+        super(LingeringReferenceCounter, self).__init__()
+        self._linger = linger
+        self._call_later = _call_later_on_timer_thread if call_later is None else call_later
+        self._pending_release = None
+        self._pending_release_handle = None
+    def is_lingering(self):
+        """Returns True if the reference count is zero but the resource has not been released yet"""
+        return self._pending_release is not None
+    def _cancel_pending_release(self):
+        # must be called with the lock held
+        if self._pending_release is None:
+            return False
+        handle = self._pending_release_handle
+        self._pending_release = self._pending_release_handle = None
+        if handle is not None:
+            handle.cancel()
+        return True
+    def add_reference(self):
+        with self._condition:
+            self._begin_transition()
+            self._reference += 1
+            activate = self._reference == 1 and not self._cancel_pending_release()
+            if activate:
+                self._in_transition = True
+        if activate:
+            try:
+                self._activate()
+            except:
+                self._end_transition(-1)
+                raise
+            self._end_transition()
+        if _tracer is not None:
+            _tracer.on_add_reference(self)
+    def depend_on_counter(self, counter):
+        _check_for_dependency_cycle(self, counter)
+        with self._condition:
+            self._begin_transition()
+            if self._reference == 0 and self._pending_release is None:
+                self._depends_on.append(counter)
+                return
+            self._in_transition = True
+        try:
+            counter.add_reference()
+            self._depends_on.append(counter)
+        finally:
+            self._end_transition()
+    def remove_reference(self):
+        with self._condition:
+            self._begin_transition()
+            if self._reference <= 0:
+                raise InvalidReferenceCount()
+            self._reference -= 1
+            if self._reference == 0:
+                self._pending_release = token = object()
+                self._pending_release_handle = self._call_later(self._linger, lambda: self._release_on_timer(token))
+        if _tracer is not None:
+            _tracer.on_remove_reference(self)
+    def release_lingering(self):
+        """Releases the resource now if it is lingering. Returns True if it was released"""
+        with self._condition:
+            token = self._pending_release
+        return token is not None and self._release(token)
+    def _release_on_timer(self, token):
+        try:
+            self._release(token)
+        except:
+            _logger.error("Exception caught during deferred release", exc_info=True)
+    def _release(self, token):
+        with self._condition:
+            self._begin_transition()
+            if token is not self._pending_release:
+                return False
+            self._cancel_pending_release()
+            self._in_transition = True
+        try:
+            self._on_reference_last_dropped()
+        except:
+            with self._condition:
+                self._pending_release = object()
+            self._end_transition()
+            raise
+        try:
+            self._decrease_dependents()
+        finally:
+            self._end_transition()
+        self._call_zero_refcount_callbacks()
+        return True
+
+def _call_later_on_timer_thread(delay, callback):
+    timer = threading.Timer(delay, callback)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+LiveReferenceCounter = namedtuple('LiveReferenceCounter', ['counter', 'reference_count', 'age', 'call_sites'])
+
+class _ReferenceTracer(object):
+    def __init__(self, sample_rate, stack_limit):
+        super(_ReferenceTracer, self).__init__()
+        self.sample_rate = sample_rate
+        self.stack_limit = stack_limit
+        # an RLock, since the weakref callbacks forgetting collected counters may run while it is held
+        self._lock = threading.RLock()
+        # id(counter) -> [weakref to the counter (or the counter, if it can't be weakly referenced),
+        #                 referenced since, call site of each outstanding reference (None if not sampled)]
+        # counters are keyed by id, as they need not be hashable
+        self._live = {}
+    def on_add_reference(self, counter):
+        call_site = None
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            call_site = _capture_call_site(self.stack_limit)
+        key = id(counter)
+        with self._lock:
+            record = self._live.get(key)
+            if record is None or _dereference(record[0]) is not counter:
+                record = self._live[key] = [self._get_reference(counter, key), time.time(), []]
+            record[2].append(call_site)
+    def _get_reference(self, counter, key):
+        try:
+            return weakref.ref(counter, functools.partial(self._forget, key))
+        except TypeError:
+            return counter
+    def _forget(self, key, ref):
+        with self._lock:
+            record = self._live.get(key)
+            if record is not None and record[0] is ref:
+                del self._live[key]
+    def on_remove_reference(self, counter):
+        key = id(counter)
+        with self._lock:
+            record = self._live.get(key)
+            if record is None or _dereference(record[0]) is not counter:
+                return
+            if counter.get_reference_count() == 0:
+                del self._live[key]
+            elif record[2]:
+                # references are anonymous, so we assume the most recent one was released
+                record[2].pop()
+    def get_live_counters(self):
+        now = time.time()
+        with self._lock:
+            records = [(_dereference(ref), referenced_since, list(call_sites))
+                       for ref, referenced_since, call_sites in self._live.values()]
+        return [LiveReferenceCounter(counter, counter.get_reference_count(), now - referenced_since,
+                                     [call_site for call_site in call_sites if call_site is not None])
+                for counter, referenced_since, call_sites in records if counter is not None]
+
+def _dereference(ref):
+    return ref() if type(ref) is weakref.ref else ref
+
+_tracer = None
+_UNTRACED_MODULES = set([__name__, 'contextlib'])
+
+def _capture_call_site(limit):
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__') in _UNTRACED_MODULES:
+        frame = frame.f_back
+    call_site = []
+    while frame is not None and len(call_site) < limit:
+        code = frame.f_code
+        call_site.append((code.co_filename, frame.f_lineno, code.co_name))
+        frame = frame.f_back
+    return call_site
+
+def enable_reference_tracing(sample_rate=1.0, stack_limit=8):
+    """
+    Starts tracking the reference counters that are referenced, for finding leaked references.
+    A `sample_rate` fraction of add_reference calls also record the `stack_limit` innermost frames of their
+    call site. Only references added while tracing is enabled are tracked. Counters that can't be weakly
+    referenced are kept alive by the tracer while they are referenced. When tracing is disabled (the default)
+    reference counting pays for a single global check.
+    """
+    global _tracer
+    _tracer = _ReferenceTracer(sample_rate, stack_limit)
+
+def disable_reference_tracing():
+    global _tracer
+    _tracer = None
+
+def get_live_counters():
+    """
+    Returns a LiveReferenceCounter for each traced counter that is referenced: its reference count, the
+    number of seconds since its count went up from zero and the sampled call sites of its outstanding
+    references, each a list of (filename, line number, function name) tuples, innermost first.
+    Releasing a reference discards the most recent call site, so call sites are exact only for counters that
+    are released in LIFO order.
+    """
+    tracer = _tracer
+    return [] if tracer is None else tracer.get_live_counters()
+
+def get_leaked_counters(threshold):
+    """Returns the live counters (see get_live_counters) that have been referenced for `threshold` seconds or more"""
+    return [live for live in get_live_counters() if live.age >= threshold]
+
+def log_leaked_counters(threshold, logger=_logger):
+    leaked = get_leaked_counters(threshold)
+    for live in leaked:
+        call_sites = "".join("\n  acquired at:\n" + "".join("    {}:{} in {}\n".format(*frame) for frame in call_site)
+                             for call_site in live.call_sites)
+        logger.warning("{!r} has {} references for {:.1f} seconds{}".format(live.counter, live.reference_count,
+                                                                            live.age, call_sites.rstrip()))
+    return leaked
+
+def _check_for_dependency_cycle(dependent, dependency):
+    visited = set()
+    pending = [dependency]
+    while pending:
+        counter = pending.pop()
+        if counter is dependent:
+            raise DependencyCycle("{!r} already depends on {!r}".format(dependency, dependent))
+        if id(counter) not in visited:
+            visited.add(id(counter))
+            pending.extend(getattr(counter, '_depends_on', ()))
+
+def _are_thread_safe(counters):
+    """Returns whether all the counters reachable from `counters` can be referenced from several threads at once"""
+    visited = set()
+    pending = list(counters)
+    while pending:
+        counter = pending.pop()
+        if id(counter) not in visited:
+            if not isinstance(counter, ThreadSafeReferenceCounter):
+                return False
+            visited.add(id(counter))
+            pending.extend(counter._depends_on)
+    return True
+
+def _get_activation_batches(counters):
+    """Groups the inactive counters reachable from `counters` by height, so each batch depends only on earlier ones"""
+    heights = {}
+    batches = []
+    def _get_height(counter):
+        # counters that are already referenced are not activated, so their dependencies are left alone
+        if counter.get_reference_count() > 0:
+            return -1
+        key = id(counter)
+        if key not in heights:
+            heights[key] = None
+            height = 1 + max([_get_height(c) for c in getattr(counter, '_depends_on', ())] or [-1])
+            heights[key] = height
+            while len(batches) <= height:
+                batches.append([])
+            batches[height].append(counter)
+        return heights[key]
+    for counter in counters:
+        _get_height(counter)
+    return batches
+
+def _activate_in_parallel(counters, executor):
+    """
+    Adds a reference to each inactive counter reachable from `counters`, activating independent ones
+    concurrently. Returns the counters referenced, in activation order, to be released with _release_all
+    """
+    activated = []
+    for batch in _get_activation_batches(counters):
+        futures = [(counter, executor.submit(counter.add_reference)) for counter in batch]
+        thrown = None
+        for counter, future in futures:
+            try:
+                future.result()
+            except BaseException:
+                if thrown is None:
+                    thrown = sys.exc_info()
+            else:
+                activated.append(counter)
+        if thrown is not None:
+            _release_all(activated)
+            reraise(*thrown)
+    return activated
+
+def _release_all(counters):
+    for counter in reversed(counters):
+        try:
+            counter.remove_reference()
+        except BaseException:
+            _logger.debug("Exception caught while releasing dependency {!r}".format(counter), exc_info=True)
+
 _ADDREF = lambda c: c.add_reference()
 _DECREF = lambda c: c.remove_reference()
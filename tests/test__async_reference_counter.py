@@ -0,0 +1,158 @@
+import asyncio
+from .test_utils import TestCase
+from infi.pyutils.reference_counter import (
+    ReferenceCounter,
+    InvalidReferenceCount,
+    enable_reference_tracing,
+    disable_reference_tracing,
+    get_live_counters,
+    )
+from infi.pyutils.async_reference_counter import AsyncReferenceCounter
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+class MyException(Exception):
+    pass
+
+class TrackingReferenceCounter(AsyncReferenceCounter):
+    def __init__(self, delay=0):
+        super(TrackingReferenceCounter, self).__init__()
+        self.delay = delay
+        self.active = False
+        self.num_activations = self.num_deactivations = 0
+        self.raise_on_addref = self.raise_on_decref = False
+    async def _on_reference_first_added(self):
+        assert not self.active
+        await asyncio.sleep(self.delay)
+        if self.raise_on_addref:
+            raise MyException()
+        self.num_activations += 1
+        self.active = True
+    async def _on_reference_last_dropped(self):
+        assert self.active
+        await asyncio.sleep(self.delay)
+        if self.raise_on_decref:
+            raise MyException()
+        self.active = False
+        self.num_deactivations += 1
+
+class AsyncReferenceCounterTest(TestCase):
+    def test__reference_counter(self):
+        async def test():
+            counter = TrackingReferenceCounter()
+            await counter.add_reference()
+            await counter.add_reference()
+            self.assertEqual(counter.get_reference_count(), 2)
+            self.assertTrue(counter.active)
+            await counter.remove_reference()
+            self.assertTrue(counter.active)
+            await counter.remove_reference()
+            self.assertFalse(counter.active)
+            with self.assertRaises(InvalidReferenceCount):
+                await counter.remove_reference()
+            async with counter.get_reference_context() as context_counter:
+                self.assertIs(context_counter, counter)
+                self.assertTrue(counter.active)
+            self.assertFalse(counter.active)
+            self.assertEqual(counter.get_reference_count(), 0)
+        run(test())
+
+    def test__concurrent_acquirers_share_first_added(self):
+        async def test():
+            counter = TrackingReferenceCounter(delay=0.01)
+            async def acquire():
+                await counter.add_reference()
+                assert counter.active
+            await asyncio.gather(*[acquire() for _ in range(10)])
+            self.assertEqual(counter.num_activations, 1)
+            self.assertEqual(counter.get_reference_count(), 10)
+            await asyncio.gather(*[counter.remove_reference() for _ in range(10)])
+            self.assertEqual(counter.num_deactivations, 1)
+            self.assertFalse(counter.active)
+        run(test())
+
+    def test__acquire_during_last_dropped(self):
+        async def test():
+            counter = TrackingReferenceCounter(delay=0.01)
+            await counter.add_reference()
+            await asyncio.gather(counter.remove_reference(), counter.add_reference())
+            self.assertTrue(counter.active)
+            self.assertEqual(counter.num_activations, 2)
+            self.assertEqual(counter.get_reference_count(), 1)
+        run(test())
+
+    def test__hook_errors(self):
+        async def test():
+            counter = TrackingReferenceCounter()
+            counter.raise_on_addref = True
+            with self.assertRaises(MyException):
+                await counter.add_reference()
+            self.assertEqual(counter.get_reference_count(), 0)
+            counter.raise_on_addref = False
+            await counter.add_reference()
+            counter.raise_on_decref = True
+            with self.assertRaises(MyException):
+                await counter.remove_reference()
+            self.assertEqual(counter.get_reference_count(), 1)
+        run(test())
+
+    def test__dependencies(self):
+        async def test():
+            counter = AsyncReferenceCounter()
+            async_dependency = TrackingReferenceCounter()
+            sync_dependency = ReferenceCounter()
+            await counter.depend_on_counter(async_dependency)
+            await counter.add_reference()
+            await counter.depend_on_counter(sync_dependency)
+            self.assertEqual(async_dependency.get_reference_count(), 1)
+            self.assertEqual(sync_dependency.get_reference_count(), 1)
+            await counter.remove_reference()
+            self.assertEqual(async_dependency.get_reference_count(), 0)
+            self.assertEqual(sync_dependency.get_reference_count(), 0)
+            self.assertFalse(async_dependency.active)
+        run(test())
+
+    def test__dependency_rollback(self):
+        async def test():
+            counter = AsyncReferenceCounter()
+            dependencies = [TrackingReferenceCounter() for _ in range(3)]
+            dependencies[-1].raise_on_addref = True
+            for dependency in dependencies:
+                await counter.depend_on_counter(dependency)
+            with self.assertRaises(MyException):
+                await counter.add_reference()
+            self.assertEqual([d.get_reference_count() for d in dependencies], [0, 0, 0])
+            self.assertEqual(counter.get_reference_count(), 0)
+        run(test())
+
+    def test__zero_refcount_callbacks(self):
+        async def test():
+            counter = AsyncReferenceCounter()
+            called = []
+            async def async_callback(c):
+                called.append(('async', c))
+            counter.add_zero_refcount_callback(async_callback)
+            counter.add_zero_refcount_callback(lambda c: called.append(('sync', c)))
+            async with counter.get_reference_context():
+                self.assertEqual(called, [])
+            self.assertEqual(called, [('async', counter), ('sync', counter)])
+        run(test())
+
+    def test__tracing(self):
+        async def test():
+            counter = AsyncReferenceCounter()
+            async with counter.get_reference_context():
+                [live] = get_live_counters()
+            self.assertIs(live.counter, counter)
+            self.assertEqual(live.call_sites[0][0][2], 'test')
+            self.assertEqual(get_live_counters(), [])
+        enable_reference_tracing()
+        try:
+            run(test())
+        finally:
+            disable_reference_tracing()
@@ -1,9 +1,12 @@
 import copy, pickle
-from infi.pyutils.enums import Enum, Value, ALL, UnboundException
+from array import array
+from infi.pyutils.enums import Enum, Value, ALL, UnboundException, SKIP_UNKNOWN
 from .test_utils import TestCase
 
 LATEST = '1000000.0'
 
+REGISTERED_ENUM = Enum(Value('one', {'1.0':['One'], '2.0':['1', 1, 'One']}), 'two', name=__name__ + '.REGISTERED_ENUM')
+
 class VersionedValueTest(TestCase):
     def test_non_versioned_value(self):
         versioned_value = Value('avg', ['AVERAGE', 'average', 'Average'])
@@ -178,6 +181,16 @@ class EnumTestCase(TestCase):
         with self.assertRaises(AttributeError):
             self.enum._fake_value
 
+    def test__get_attribute_is_case_insensitive(self):
+        for name in ("value", "VALUE", "Value", "vAlUe"):
+            self.assertIs(getattr(self.enum, name), self.enum.value)
+            self.assertIs(getattr(self.enum, name), self.enum["value"])
+
+    def test__members_do_not_shadow_methods(self):
+        enum = Enum("get", "other")
+        self.assertEqual(enum.get("other"), enum.other)
+        self.assertEqual(enum["get"], "GET")
+
     def test__deepcopy(self):
         my_dict = {'a': 1, 'b': Enum('a', 'b', 'c', 'd')}
         dict_copy = copy.deepcopy(my_dict)
@@ -193,6 +206,12 @@ class EnumTestCase(TestCase):
     def test__picklable(self):
         self.assertTrue(self.enum == pickle.loads(pickle.dumps(self.enum)))
 
+    def test__picklable_bound(self):
+        enum = Enum(Value('one', {'1.0':['One'], '2.0':['1', 'One']})).as_version('2.0')
+        unpickled = pickle.loads(pickle.dumps(enum))
+        self.assertEqual(unpickled.get_bound_version(), '2.0')
+        self.assertEqual(unpickled.one.get_values(), ['1', 'One'])
+
     def assertEquality(self, a, b):
         msg = "Equality check for {0!r} == {1!r} failed".format(a, b)
         self.assertTrue(a == b, msg)
@@ -213,3 +232,161 @@ class TestValues(TestCase):
         values = [Value("B"), Value("a")]
         values.sort()
         assert values == [Value("a"), Value("B")]
+
+class SharedRepresentationTest(TestCase):
+    def versioned_enum(self):
+        return Enum(Value('one', {'1.0':['One'], '2.0':['1', 1, 'One']}),
+                    Value('two', {'2.0':['2', 2, 'Two']}))
+
+    def test__values_are_slotted(self):
+        value = Value('avg', ['AVERAGE'])
+        self.assertFalse(hasattr(value, '__dict__'))
+        with self.assertRaises(AttributeError):
+            value.some_attribute = 2
+
+    def test__value_views_share_version_table(self):
+        value = Value('avg', {'1.0':['AVERAGE'], '2.0':['avg']})
+        self.assertIs(value.as_version('1.0')._table, value.as_version('2.0')._table)
+
+    def test__get_values_is_a_copy(self):
+        value = Value('avg', ['AVERAGE'])
+        value.get_values().append('bla')
+        self.assertEqual(value.get_values(), ['avg', 'AVERAGE'])
+
+    def test__enum_views_share_members(self):
+        versioned_enum = self.versioned_enum()
+        bound_1 = versioned_enum.as_version('1.0')
+        bound_2 = versioned_enum.as_version('2.0')
+        self.assertIs(bound_1._table, bound_2._table)
+        self.assertIs(bound_1.one._table, bound_2.one._table)
+        self.assertEqual(bound_1.one.get_values(), ['One'])
+        self.assertEqual(bound_2.one.get_values(), ['1', 1, 'One'])
+
+    def test__bind_rebinds_values_in_place(self):
+        versioned_enum = self.versioned_enum().as_version('1.0')
+        one = versioned_enum.one
+        versioned_enum.bind_to_version('2.0')
+        self.assertEqual(one.get_values(), ['1', 1, 'One'])
+
+    def test__versions_are_sorted_numerically(self):
+        value = Value('a', {'9.0':['nine'], '10.0':['ten']})
+        self.assertEqual(value.as_version('10.5').get_values(), ['ten'])
+        self.assertEqual(value.as_version('9.5').get_values(), ['nine'])
+
+class BulkParseTest(TestCase):
+    def setUp(self):
+        super(BulkParseTest, self).setUp()
+        self.enum = Enum(Value('one', {'1.0':['One'], '2.0':['1', 1, 'One']}),
+                         Value('two', {'2.0':['2', 2, 'Two', 'one']})).as_version('2.0')
+
+    def test__parse_many(self):
+        parsed = self.enum.parse_many(['One', 'ONE', '2', 2, 1, 'two'])
+        self.assertEqual([str(value) for value in parsed], ['ONE', 'ONE', 'TWO', 'TWO', 'ONE', 'TWO'])
+        self.assertIs(parsed[0], self.enum.one)
+
+    def test__first_matching_member_wins(self):
+        self.assertIs(self.enum.get('one'), self.enum.one)
+        self.assertEqual(self.enum.parse_many(['one', 'One']), [self.enum.one, self.enum.one])
+
+    def test__parse_many_matches_get(self):
+        for raw_value in ('One', 'one', 1, '1', 'TWO', 2, True):
+            try:
+                expected = self.enum.get(raw_value)
+            except UnboundException:
+                with self.assertRaises(UnboundException):
+                    self.enum.parse_many([raw_value])
+            else:
+                self.assertEqual(self.enum.parse_many([raw_value]), [expected])
+
+    def test__unknown_values(self):
+        with self.assertRaises(UnboundException):
+            self.enum.parse_many(['one', 'three'])
+        self.assertEqual(self.enum.parse_many(['one', 'three', ['x']], unknown=SKIP_UNKNOWN), [self.enum.one])
+        self.assertEqual(self.enum.parse_many(['one', 'three'], unknown=None), [self.enum.one, None])
+
+    def test__codes(self):
+        self.assertEqual(self.enum.codes(['two', 'One', 'three'], unknown=SKIP_UNKNOWN), [1, 0])
+        codes = self.enum.codes(['two', 'One', 'three'], unknown=0xFFFF, typecode='H')
+        self.assertEqual(codes, array('H', [1, 0, 0xFFFF]))
+        self.assertEqual(self.enum.from_codes([1, 0]), [self.enum.two, self.enum.one])
+
+    def test__version_specific_lookup(self):
+        enum_1 = self.enum.as_version('1.0')
+        self.assertEqual(enum_1.codes(['one', 1], unknown=None), [0, None])
+        self.assertIn('One', enum_1)
+        self.assertNotIn('two', enum_1)
+
+    def test__unbound(self):
+        with self.assertRaises(UnboundException):
+            self.enum.as_version(None).parse_many(['one'])
+
+
+class RegisteredEnumPickleTest(TestCase):
+    def test__members_are_pickled_by_reference(self):
+        member = REGISTERED_ENUM.as_version('2.0').one
+        self.assertIn(b'REGISTERED_ENUM', pickle.dumps(member))
+        self.assertNotIn(b'One', pickle.dumps(member))
+
+    def test__members_are_interned(self):
+        member = REGISTERED_ENUM.as_version('2.0').one
+        first = pickle.loads(pickle.dumps(member))
+        second = pickle.loads(pickle.dumps([member, member]))
+        self.assertIs(first, second[0])
+        self.assertIs(first, second[1])
+        self.assertEqual(first.get_values(), ['1', 1, 'One'])
+        self.assertEqual(pickle.loads(pickle.dumps(REGISTERED_ENUM.as_version('1.0').one)).get_values(), ['One'])
+
+    def test__enum_is_interned(self):
+        bound = REGISTERED_ENUM.as_version('2.0')
+        unpickled = pickle.loads(pickle.dumps(bound))
+        self.assertIs(unpickled, pickle.loads(pickle.dumps(bound)))
+        self.assertEqual(unpickled, bound)
+        self.assertIs(unpickled.one, pickle.loads(pickle.dumps(bound.one)))
+
+    def test__deepcopy_is_not_interned(self):
+        bound = REGISTERED_ENUM.as_version('2.0')
+        self.assertIsNot(copy.deepcopy(bound), bound)
+        self.assertEqual(copy.deepcopy(bound), bound)
+        self.assertEqual(copy.deepcopy(bound.one).get_values(), ['1', 1, 'One'])
+
+    def test__unknown_name(self):
+        enum = Enum('a', name='no_such_module_for_enums.ENUM')
+        data = pickle.dumps(enum.a)
+        from infi.pyutils import enums
+        enums._REGISTERED_ENUMS.pop('no_such_module_for_enums.ENUM')
+        with self.assertRaises(ImportError):
+            pickle.loads(data)
+        Enum('a', name='not_qualified')
+        data = pickle.dumps(Enum('a', name='not_qualified'))
+        enums._REGISTERED_ENUMS.pop('not_qualified')
+        with self.assertRaises(LookupError):
+            pickle.loads(data)
+
+class OrdinalTest(TestCase):
+    def test__ordinals(self):
+        enum = Enum('c', 'a', 'b')
+        self.assertEqual([value.get_ordinal() for value in enum], [0, 1, 2])
+        self.assertIsNone(Value('a').get_ordinal())
+
+    def test__members_sort_by_name(self):
+        enum = Enum('c', 'a', 'B')
+        self.assertEqual([str(value) for value in sorted([enum.c, enum.b, enum.a])], ['A', 'B', 'C'])
+        self.assertTrue(enum.a < enum.b)
+        self.assertFalse(enum.b < enum.a)
+        self.assertTrue(enum.a < Value('b'))
+        self.assertTrue(Value('b') < enum.c)
+
+    def test__ordered_members_sort_by_ordinal(self):
+        enum = Enum('c', 'a', 'b', ordered=True)
+        self.assertEqual([str(value) for value in sorted([enum.b, enum.a, enum.c])], ['C', 'A', 'B'])
+        self.assertTrue(enum.c < enum.a)
+        self.assertEqual([str(value) for value in sorted(pickle.loads(pickle.dumps(enum)))], ['C', 'A', 'B'])
+
+    def test__ordering_across_versions(self):
+        enum = Enum(Value('b', {'1.0':['b']}), Value('a', {'1.0':['a']}), ordered=True)
+        self.assertTrue(enum.as_version('1.0').b < enum.as_version('2.0').a)
+
+    def test__hash(self):
+        enum = Enum('a', 'b')
+        self.assertEqual(hash(enum.a), hash(Value('a')))
+        self.assertEqual(len(set([enum.a, enum.as_version('1.0').a, enum.b])), 2)
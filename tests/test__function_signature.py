@@ -1,6 +1,8 @@
+import sys
 import time
+from unittest import skipIf
 from .test_utils import TestCase
-from infi.pyutils.function_signature import FunctionSignature
+from infi.pyutils.function_signature import FunctionSignature, POSITIONAL_ONLY, POSITIONAL_OR_KEYWORD
 from infi.pyutils.exceptions import SignatureException, InvalidKeywordArgument, UnknownArguments, MissingArguments
 
 # no named tuples for python 2.5 compliance...
@@ -186,3 +188,202 @@ class BinaryFunctionSignatureTest(TestCase):
         class SomeObject(object):
             pass
         sig = FunctionSignature(SomeObject.__ge__)
+
+class SignatureCacheTest(TestCase):
+    def test__arguments_are_shared(self):
+        def f(a, b=2):
+            pass
+        self.assertIs(FunctionSignature(f)._args, FunctionSignature(f)._args)
+    def test__bound_methods_share_function_arguments(self):
+        class SomeClass(object):
+            def method(self, a):
+                pass
+        self.assertIs(FunctionSignature(SomeClass().method)._args, FunctionSignature(SomeClass.method)._args)
+        self.assertEquals(list(FunctionSignature(SomeClass().method).get_arg_names()), ['a'])
+    def test__replaced_defaults(self):
+        def f(a, b=2):
+            pass
+        self.assertEquals(FunctionSignature(f).get_required_arg_names(), set(['a']))
+        f.__defaults__ = (1, 2)
+        self.assertEquals(FunctionSignature(f).get_required_arg_names(), set())
+    def test__cache_does_not_keep_functions_alive(self):
+        import gc
+        import weakref
+        def f(a):
+            pass
+        FunctionSignature(f)
+        ref = weakref.ref(f)
+        del f
+        gc.collect()
+        self.assertIsNone(ref())
+    def test__wrapped_functions(self):
+        from infi.pyutils.decorators import wraps
+        def f(a, b):
+            pass
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            pass
+        self.assertEquals(list(FunctionSignature(wrapper).get_arg_names()), ['a', 'b'])
+
+class NormalizerTest(TestCase):
+    def _get_functions(self):
+        class SomeClass(object):
+            def method(self, a, b=2):
+                pass
+        many_args = eval("lambda %s, *args: None" % ", ".join("a%s" % i for i in range(20)))
+        return [lambda: None,
+                lambda a: None,
+                lambda a, b, c=3: None,
+                lambda a, b=2, *args: None,
+                lambda a, b=2, **kwargs: None,
+                lambda *args, **kwargs: None,
+                many_args,
+                SomeClass().method,
+                SomeClass.method]
+    def _get_calls(self):
+        return [((), {}), ((1,), {}), ((1, 2), {}), ((1, 2, 3), {}), ((1, 2, 3, 4), {}),
+                ((), dict(a=1)), ((1,), dict(a=1)), ((1,), dict(b=2)), ((), dict(b=2, c=3)),
+                ((1,), dict(d=4)), ((1,), {1: 2}), ((1, 2, 3, 4), {0: 5}), ((1,), dict(self=1)),
+                (tuple(range(20)), {}), (tuple(range(22)), {}), (tuple(range(19)), dict(a19=1))]
+    def _get_result(self, func, *args):
+        try:
+            return func(*args)
+        except SignatureException as e:
+            return type(e)
+        except InvalidKeywordArgument as e:
+            return type(e)
+    def test__matches_reference_implementation(self):
+        for func in self._get_functions():
+            sig = FunctionSignature(func)
+            for args, kwargs in self._get_calls():
+                self.assertEquals(self._get_result(sig.get_normalized_args, args, kwargs),
+                                  self._get_result(sig._get_normalized_args_slowly, args, kwargs))
+    def test__normalizer_is_shared(self):
+        def f(a, b):
+            pass
+        sig1 = FunctionSignature(f)
+        sig2 = FunctionSignature(f)
+        sig1.get_normalized_args((1, 2), {})
+        sig2.get_normalized_args((1, 2), {})
+        self.assertIs(sig1._tables.normalize, sig2._tables.normalize)
+
+def _define(source):
+    namespace = {}
+    exec(source, namespace)
+    return namespace['f']
+
+@skipIf(sys.version_info < (3, 8), "keyword-only and positional-only arguments require Python 3.8")
+class ArgumentKindsTest(TestCase):
+    def test__keyword_only(self):
+        sig = FunctionSignature(_define("def f(a, *args, b, c=3): pass"))
+        self.assertEquals(list(sig.get_arg_names()), ['a'])
+        self.assertEquals(list(sig.get_kwonly_arg_names()), ['b', 'c'])
+        self.assertEquals(sig.get_required_arg_names(), set(['a', 'b']))
+        self.assertEquals(sig.get_normalized_args((1, 2), dict(b=4)), {'a': 1, 0: 2, 'b': 4})
+        with self.assertRaises(MissingArguments):
+            sig.get_normalized_args((1, 2), {})
+        with self.assertRaises(UnknownArguments):
+            sig.get_normalized_args((1,), dict(b=2, d=4))
+    def test__keyword_only_without_varargs(self):
+        sig = FunctionSignature(_define("def f(a, *, b): pass"))
+        self.assertEquals(sig.get_normalized_args((), dict(a=1, b=2)), dict(a=1, b=2))
+        with self.assertRaises(UnknownArguments):
+            sig.get_normalized_args((1, 2), dict(b=3))
+    def test__positional_only(self):
+        sig = FunctionSignature(_define("def f(a, b=2, /, c=3): pass"))
+        self.assertEquals([arg.kind for arg in sig.get_args()], [POSITIONAL_ONLY, POSITIONAL_ONLY, POSITIONAL_OR_KEYWORD])
+        self.assertEquals(sig.get_normalized_args((1,), dict(c=4)), dict(a=1, c=4))
+        with self.assertRaises(UnknownArguments):
+            sig.get_normalized_args((1,), dict(b=4))
+    def test__positional_only_with_kwargs(self):
+        sig = FunctionSignature(_define("def f(a, /, **kwargs): pass"))
+        self.assertEquals(sig.get_normalized_args((1,), dict(b=4)), dict(a=1, b=4))
+        with self.assertRaises(UnknownArguments):
+            sig.get_normalized_args((1,), dict(a=4))
+    def test__annotations(self):
+        sig = FunctionSignature(_define("def f(a: int, b=2, *, c: str='x'): pass"))
+        args = list(sig.get_args()) + list(sig.get_kwonly_args())
+        self.assertEquals([arg.has_annotation() for arg in args], [True, False, True])
+        self.assertIs(args[0].annotation, int)
+        self.assertIs(args[2].annotation, str)
+    def test__builtins_with_signatures(self):
+        sig = FunctionSignature(len)
+        self.assertFalse(sig.has_variable_args())
+        self.assertEquals(sig.get_normalized_args(([],), {}), {'obj': []})
+        with self.assertRaises(UnknownArguments):
+            sig.get_normalized_args((), dict(obj=[]))
+    def test__matches_reference_implementation(self):
+        functions = [_define("def f(a, *args, b, c=3): pass"),
+                     _define("def f(a, /, b, *, c, **kwargs): pass"),
+                     _define("def f(a=1, /, *args, b=2, **kwargs): pass")]
+        calls = [((), {}), ((1,), {}), ((1, 2), {}), ((1, 2, 3), {}), ((1,), dict(b=2, c=3)),
+                 ((1,), dict(a=1, b=2, c=3)), ((1, 2), dict(c=3)), ((), dict(b=2, c=3)), ((1,), {1: 2})]
+        reference = NormalizerTest('test__matches_reference_implementation')
+        for func in functions:
+            sig = FunctionSignature(func)
+            for args, kwargs in calls:
+                self.assertEquals(reference._get_result(sig.get_normalized_args, args, kwargs),
+                                  reference._get_result(sig._get_normalized_args_slowly, args, kwargs))
+
+class NormalizeManyTest(TestCase):
+    def test__normalize_many(self):
+        def f(a, b, c=3):
+            pass
+        sig = FunctionSignature(f)
+        normalized, errors = sig.normalize_many([((1, 2), {}), ((1,), {}), ((), dict(a=1, b=2, c=4)), ((1, 2), {3: 4}), ((1, 2, 3, 4), {})])
+        self.assertEquals(normalized, [dict(a=1, b=2), None, dict(a=1, b=2, c=4), None, None])
+        self.assertEquals(sorted(errors), [1, 3, 4])
+        self.assertIsInstance(errors[1], MissingArguments)
+        self.assertIsInstance(errors[3], InvalidKeywordArgument)
+        self.assertIsInstance(errors[4], UnknownArguments)
+    def test__normalize_many_bound_method(self):
+        class SomeClass(object):
+            def method(self, a):
+                pass
+        sig = FunctionSignature(SomeClass().method)
+        normalized, errors = sig.normalize_many(iter([((1,), {}), ((), dict(self=2))]))
+        self.assertEquals(normalized, [dict(a=1), None])
+        self.assertIsInstance(errors[1], MissingArguments)
+    def test__normalize_many_empty(self):
+        self.assertEquals(FunctionSignature(lambda: None).normalize_many([]), ([], {}))
+
+class CallKeyTest(TestCase):
+    def test__equivalent_calls(self):
+        def f(a, b=2, c=3):
+            pass
+        sig = FunctionSignature(f)
+        key = sig.get_call_key((1,), {})
+        for args, kwargs in [((1, 2), {}), ((1, 2, 3), {}), ((), dict(a=1)), ((1,), dict(c=3, b=2))]:
+            self.assertEquals(sig.get_call_key(args, kwargs), key)
+            self.assertEquals(hash(sig.get_call_key(args, kwargs)), hash(key))
+        self.assertNotEquals(sig.get_call_key((1, 3), {}), key)
+    def test__variable_arguments(self):
+        def f(a, *args, **kwargs):
+            pass
+        sig = FunctionSignature(f)
+        self.assertEquals(sig.get_call_key((1,), dict(x=3)), sig.get_call_key((), dict(a=1, x=3)))
+        self.assertNotEquals(sig.get_call_key((1, 2), {}), sig.get_call_key((1,), {}))
+        self.assertNotEquals(sig.get_call_key((1, 2), {}), sig.get_call_key((1,), dict(x=2)))
+        self.assertEquals(sig.get_call_key((1,), dict(x=2, y=3)), sig.get_call_key((1,), dict(y=3, x=2)))
+    def test__invalid_calls(self):
+        sig = FunctionSignature(lambda a: None)
+        with self.assertRaises(MissingArguments):
+            sig.get_call_key((), {})
+    def test__decorator(self):
+        from infi.pyutils.function_signature import canonical_call_key
+        @canonical_call_key
+        def f(a, b=2):
+            return a + b
+        self.assertEquals(f(1), 3)
+        self.assertEquals(f.get_call_key(1), f.get_call_key(a=1, b=2))
+        with self.assertRaises(UnknownArguments):
+            f.get_call_key(1, c=2)
+    def test__method_call_key_builder(self):
+        from infi.pyutils.function_signature import get_call_key_builder
+        class SomeClass(object):
+            def method(self, a, b=2):
+                pass
+        call_key = get_call_key_builder(SomeClass.method, is_method=True)
+        self.assertEquals(call_key((1,), {}), call_key((), dict(a=1, b=2)))
+        self.assertEquals(call_key((1,), {}), get_call_key_builder(SomeClass().method)((1,), {}))
+        self.assertIsNone(call_key((), {}))
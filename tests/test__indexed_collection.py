@@ -0,0 +1,123 @@
+import itertools
+from .test_utils import TestCase
+from infi.pyutils.enums import Value
+from infi.pyutils.indexed_collection import IndexedCollection
+from infi.pyutils.predicates import Predicate, And, Or, Not, Equality, ObjectAttributes, DictionaryItems
+
+class IndexedCollectionTest(TestCase):
+    def setUp(self):
+        super(IndexedCollectionTest, self).setUp()
+        self.items = [Record(status=status, pool=pool, name="{0}{1}".format(status, pool))
+                      for status, pool in itertools.product(['ok', 'failed', 'degraded'], range(10))]
+        self.collection = IndexedCollection(self.items, attributes=['status', 'pool'])
+        self.evaluated = []
+
+    def _tracked(self, pred):
+        def _evaluate(item):
+            self.evaluated.append(item)
+            return pred(item)
+        return Predicate(_evaluate)
+
+    def assertSelects(self, pred, collection=None, items=None):
+        collection = self.collection if collection is None else collection
+        items = self.items if items is None else items
+        self.assertEqual(list(map(id, collection.select(pred))), [id(item) for item in items if pred(item)])
+
+    def test__select(self):
+        for pred in [ObjectAttributes(status='ok'), ObjectAttributes(status='ok', pool=3), ObjectAttributes(pool=11),
+                     ObjectAttributes(name='ok3'), ObjectAttributes(status=[]), Not(ObjectAttributes(status='ok')),
+                     And(ObjectAttributes(pool=2), Not(ObjectAttributes(status='failed'))),
+                     Or(ObjectAttributes(pool=2), ObjectAttributes(status='degraded')),
+                     Or(ObjectAttributes(pool=2), ObjectAttributes(name='ok1')),
+                     And(ObjectAttributes(status='ok'), Or(ObjectAttributes(pool=1), ObjectAttributes(pool=2))),
+                     ObjectAttributes(status='ok', pool=2).compile()]:
+            self.assertSelects(pred)
+
+    def test__most_selective_index_is_used(self):
+        self.collection.select(And(ObjectAttributes(status='ok'), self._tracked(ObjectAttributes(pool=2))))
+        self.assertEqual(len(self.evaluated), 10)
+        del self.evaluated[:]
+        self.collection.select(And(ObjectAttributes(status='ok', pool=2), self._tracked(ObjectAttributes(name='ok2'))))
+        self.assertEqual([item.name for item in self.evaluated], ['ok2'])
+
+    def test__or_of_indexed_predicates(self):
+        pred = self._tracked(Or(ObjectAttributes(pool=1), ObjectAttributes(pool=2)))
+        self.collection.select(And(Or(ObjectAttributes(pool=1), ObjectAttributes(pool=2)), pred))
+        self.assertEqual(len(self.evaluated), 6)
+
+    def test__unindexed_predicates_scan(self):
+        self.assertEqual(len(self.collection.select(self._tracked(ObjectAttributes(name='ok1')))), 1)
+        self.assertEqual(len(self.evaluated), len(self.items))
+
+    def test__add_and_remove(self):
+        item = Record(status='ok', pool=2, name='new')
+        self.collection.add(item)
+        self.items.append(item)
+        self.assertIn(item, self.collection)
+        self.assertEqual(len(self.collection), len(self.items))
+        self.assertSelects(ObjectAttributes(status='ok', pool=2))
+        self.collection.remove(item)
+        self.items.remove(item)
+        self.assertNotIn(item, self.collection)
+        self.assertSelects(ObjectAttributes(status='ok', pool=2))
+        with self.assertRaises(ValueError):
+            self.collection.remove(item)
+        for item in list(self.collection):
+            self.collection.remove(item)
+        self.assertEqual(len(self.collection), 0)
+        self.assertEqual(self.collection.select(ObjectAttributes(status='ok')), [])
+
+    def test__reindex(self):
+        item = self.items[0]
+        item.pool = 100
+        self.collection.reindex(item)
+        self.assertEqual(self.collection.select(ObjectAttributes(pool=100)), [item])
+        self.assertSelects(ObjectAttributes(pool=0))
+
+    def test__unhashable_attribute_values(self):
+        item = Record(status=['ok'], pool=1)
+        self.collection.add(item)
+        self.items.append(item)
+        self.assertEqual(self.collection.select(ObjectAttributes(status=['ok'])), [item])
+        self.assertSelects(ObjectAttributes(status='ok'))
+        self.collection.remove(item)
+        self.assertEqual(self.collection.select(ObjectAttributes(status=['ok'])), [])
+
+    def test__enum_values(self):
+        ok = Value('ok', ['good'])
+        item = Record(status=ok, pool=1)
+        self.collection.add(item)
+        self.items.append(item)
+        for status in ['ok', 'OK', 'good', ok, Value('fine', ['OK'])]:
+            self.assertSelects(ObjectAttributes(status=status))
+            self.assertIn(item, self.collection.select(ObjectAttributes(status=status)))
+        self.assertSelects(ObjectAttributes(status=Value('failed')))
+
+    def test__collection_order(self):
+        items = [Record(status=['ok'], pool=1)] + self.items + [Record(status=Value('ok'), pool=1)]
+        collection = IndexedCollection(items, attributes=['status', 'pool'])
+        for pred in [ObjectAttributes(status='ok'), Or(ObjectAttributes(pool=2), ObjectAttributes(pool=1)),
+                     Or(ObjectAttributes(status='ok'), ObjectAttributes(status=['ok']))]:
+            self.assertSelects(pred, collection, items)
+        collection.reindex(items[1])
+        self.assertEqual(collection.select(ObjectAttributes(status='ok'))[-2:], [items[-1], items[1]])
+
+    def test__dictionaries(self):
+        items = [dict(status=status, pool=pool) for status, pool in itertools.product(['ok', 'failed'], range(3))]
+        items.append(dict(pool=1))
+        collection = IndexedCollection(items, keys=['status'])
+        for pred in [DictionaryItems(status='ok'), DictionaryItems(status='ok', pool=2), DictionaryItems(pool=1)]:
+            self.assertSelects(pred, collection, items)
+
+    def test__item_index(self):
+        items = [1, 2, 3, 2.0, 'a']
+        collection = IndexedCollection(items, index_items=True)
+        self.assertEqual(collection.select(Equality(2)), [2, 2.0])
+        self.assertEqual(collection.select(Equality(4)), [])
+
+class Record(object):
+    def __init__(self, **attributes):
+        super(Record, self).__init__()
+        self.__dict__.update(attributes)
+    def __repr__(self):
+        return "<Record {0!r}>".format(self.__dict__)
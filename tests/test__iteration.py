@@ -0,0 +1,63 @@
+from .test_utils import TestCase
+from infi.pyutils import iterate
+from infi.pyutils.iteration import Iteration, MutableIteration
+
+class IterateTest(TestCase):
+    def _get_expected(self, elements):
+        return [((index, index + 1, index == 0, index == len(elements) - 1), element)
+                for index, element in enumerate(elements)]
+
+    def _get_iterables(self, elements):
+        return [list(elements), tuple(elements), (element for element in elements), iter(list(elements))]
+
+    def _as_tuples(self, iterations):
+        return [((iteration.counter0, iteration.counter1, iteration.first, iteration.last), element)
+                for iteration, element in iterations]
+
+    def test__iterate(self):
+        for elements in [[], ['a'], ['a', 'b'], list(range(10))]:
+            for iterable in self._get_iterables(elements):
+                iterations = list(iterate(iterable))
+                self.assertEqual(self._as_tuples(iterations), self._get_expected(elements))
+                for iteration, _ in iterations:
+                    self.assertIsInstance(iteration, Iteration)
+
+    def test__reuse_iteration(self):
+        for elements in [[], ['a'], ['a', 'b'], list(range(10))]:
+            for iterable in self._get_iterables(elements):
+                observed = []
+                iteration_ids = set()
+                for iteration, element in iterate(iterable, reuse_iteration=True):
+                    iteration_ids.add(id(iteration))
+                    observed.append(((iteration.counter0, iteration.counter1, iteration.first, iteration.last), element))
+                self.assertEqual(observed, self._get_expected(elements))
+                self.assertEqual(len(iteration_ids), min(len(elements), 1))
+
+    def test__reuse_iteration_of_generator(self):
+        observed = [((iteration.counter0, iteration.counter1, iteration.first, iteration.last), element)
+                    for iteration, element in iterate((x for x in 'abc'), reuse_iteration=True)]
+        self.assertEqual(observed, self._get_expected('abc'))
+        for iteration, _ in iterate(iter('abc'), reuse_iteration=True):
+            self.assertIsInstance(iteration, MutableIteration)
+
+    def test__sized_collections(self):
+        self.assertEqual([iteration.last for iteration, _ in iterate(dict(a=1, b=2))], [False, True])
+        self.assertEqual([iteration.last for iteration, _ in iterate(range(3))], [False, False, True])
+
+    def test__len_not_matching_iteration(self):
+        class Columns(object):
+            def __len__(self):
+                return 3
+            def __iter__(self):
+                return iter(['a', 'b'])
+        self.assertEqual([iteration.last for iteration, _ in iterate(Columns())], [False, True])
+
+    def test__len_is_taken_when_iteration_starts(self):
+        elements = [1, 2]
+        iterations = iterate(elements)
+        elements.append(3)
+        self.assertEqual([iteration.last for iteration, _ in iterations], [False, False, True])
+
+    def test__iteration(self):
+        iteration = Iteration(counter0=1, counter1=2, first=False, last=True)
+        self.assertEqual((iteration.counter0, iteration.counter1, iteration.first, iteration.last), (1, 2, False, True))
@@ -181,6 +181,79 @@ class CachedFunctionTest(TestCase):
         self.assertNotEqual(first, second)
         self.assertEqual(second, third)
 
+class CanonicalCallKeyTest(TestCase):
+    def test_cached_function_shares_equivalent_calls(self):
+        calls = []
+        @cached_function
+        def f(a, b=2):
+            calls.append((a, b))
+            return a + b
+        self.assertEqual(f(1, 2), 3)
+        self.assertEqual(f(1), 3)
+        self.assertEqual(f(a=1, b=2), 3)
+        self.assertEqual(f(1, b=2), 3)
+        self.assertEqual(calls, [(1, 2)])
+        clear_cached_entry(f, a=1)
+        self.assertEqual(f(1, 2), 3)
+        self.assertEqual(len(calls), 2)
+
+    def test_cached_method_shares_equivalent_calls(self):
+        class Subject(object):
+            calls = 0
+            @cached_method
+            def method(self, a, b=2):
+                self.calls += 1
+                return a + b
+        subject = Subject()
+        self.assertEqual(subject.method(1), 3)
+        self.assertEqual(subject.method(1, 2), 3)
+        self.assertEqual(subject.method(b=2, a=1), 3)
+        self.assertEqual(subject.calls, 1)
+        clear_cached_entry(subject.method, 1, b=2)
+        self.assertEqual(subject.method(1), 3)
+        self.assertEqual(subject.calls, 2)
+
+    def test_invalid_calls_raise(self):
+        @cached_function
+        def f(a):
+            pass
+        with self.assertRaises(TypeError):
+            f()
+        with self.assertRaises(TypeError):
+            f(1, 2)
+
+    def test_unhashable_arguments_are_not_cached(self):
+        calls = []
+        @cached_function
+        def f(a, *args):
+            calls.append(a)
+        f([1], 2)
+        f([1], 2)
+        f(1, [2])
+        self.assertEqual(len(calls), 3)
+
+    def test_unhashable_defaults_are_cached_when_omitted(self):
+        calls = []
+        @cached_function
+        def f(a, opts={}):
+            calls.append(a)
+        f(1)
+        f(1)
+        f(a=1)
+        self.assertEqual(calls, [1])
+        f(1, {})
+        self.assertEqual(len(calls), 2)
+
+        class Subject(object):
+            calls = 0
+            @cached_method
+            def method(self, a, b=[]):
+                self.calls += 1
+        subject = Subject()
+        subject.method(1)
+        subject.method(1)
+        self.assertEqual(subject.calls, 1)
+
 class Counter(object):
     def __init__(self):
         super(Counter, self).__init__()
@@ -1,6 +1,8 @@
+import gc
 import platform
+import weakref
 from .test_utils import TestCase
-from infi.pyutils.method_map import MethodMap
+from infi.pyutils.method_map import MethodMap, TypeMethodMap
 
 class MethodMapTest(TestCase):
     def test__method_map(self):
@@ -51,3 +53,131 @@ class MethodMapTest(TestCase):
             def func(self):
                 raise Exception("Shouldn't  be called!!!")
         self.assertEquals(MyObj().METHODS.get('key')(), 666)
+
+class DispatchTest(TestCase):
+    def setUp(self):
+        super(DispatchTest, self).setUp()
+        class MyObj(object):
+            METHODS = MethodMap()
+            def __init__(self, value):
+                super(MyObj, self).__init__()
+                self.value = value
+            @METHODS.registering('method')
+            def method(self, arg, kwarg=None):
+                return (self, arg, kwarg)
+            @METHODS.registering('classmethod')
+            @classmethod
+            def class_method(cls, arg):
+                return (cls, arg)
+            @METHODS.registering('staticmethod')
+            @staticmethod
+            def static_method(arg):
+                return arg
+        self.cls = MyObj
+        self.obj = MyObj(1)
+
+    def test__dispatch(self):
+        self.assertEquals(self.obj.METHODS.dispatch('method', 2, 3), (self.obj, 2, 3))
+        self.assertEquals(self.obj.METHODS.dispatch('classmethod', 2), (self.cls, 2))
+        self.assertEquals(self.obj.METHODS.dispatch('staticmethod', 2), 2)
+        with self.assertRaises(LookupError):
+            self.obj.METHODS.dispatch('missing')
+
+    def test__binding(self):
+        self.assertIs(self.obj.METHODS['method'](2)[0], self.obj)
+        self.assertIs(self.obj.METHODS['classmethod'](2)[0], self.cls)
+        class Derived(self.cls):
+            pass
+        self.assertIs(Derived(2).METHODS['classmethod'](2)[0], Derived)
+
+    def test__access_through_class(self):
+        self.assertEquals(self.cls.METHODS['method'](self.obj, 2), (self.obj, 2, None))
+        self.assertEquals(self.cls.METHODS.dispatch('method', self.obj, 2), (self.obj, 2, None))
+        self.assertEquals(self.cls.METHODS.dispatch('classmethod', 2), (self.cls, 2))
+
+    def test__dispatch_table_is_rebuilt_on_registration(self):
+        method_map = self.cls.__dict__['METHODS']
+        table = method_map.get_dispatch_table(self.cls)
+        self.assertIs(method_map.get_dispatch_table(self.cls), table)
+        method_map.register('new', lambda self: 'new')
+        self.assertIsNot(method_map.get_dispatch_table(self.cls), table)
+        self.assertEquals(self.obj.METHODS.dispatch('new'), 'new')
+
+    def test__owner_classes_are_collected(self):
+        derived_refs = []
+        for _ in range(3):
+            derived = type('Derived', (self.cls,), {})
+            self.assertEquals(derived(2).METHODS.dispatch('classmethod', 2), (derived, 2))
+            derived_refs.append(weakref.ref(derived))
+        del derived
+        gc.collect()
+        self.assertEquals([derived_ref() for derived_ref in derived_refs], [None, None, None])
+
+class TypeMethodMapTest(TestCase):
+    def setUp(self):
+        super(TypeMethodMapTest, self).setUp()
+        class Handler(object):
+            HANDLERS = TypeMethodMap()
+            @HANDLERS.registering(Exception)
+            def _handle_exception(self, message):
+                return ('exception', message)
+            @HANDLERS.registering(LookupError)
+            @classmethod
+            def _handle_lookup_error(cls, message):
+                return ('lookup', cls)
+        class SpecificHandler(Handler):
+            HANDLERS = TypeMethodMap()
+            @HANDLERS.registering(KeyError)
+            def _handle_key_error(self, message):
+                return ('key', message)
+            @HANDLERS.registering(Exception)
+            def _handle_any_exception(self, message):
+                return ('any', message)
+        self.handler_class = Handler
+        self.specific_handler_class = SpecificHandler
+
+    def _dispatch(self, handler, message):
+        return handler.HANDLERS.dispatch(type(message), message)
+
+    def test__mro_resolution(self):
+        handler = self.handler_class()
+        error = ValueError()
+        self.assertEquals(self._dispatch(handler, error), ('exception', error))
+        self.assertEquals(self._dispatch(handler, KeyError()), ('lookup', self.handler_class))
+        self.assertEquals(handler.HANDLERS.get(int), None)
+        with self.assertRaises(KeyError):
+            handler.HANDLERS.dispatch(int, 1)
+        with self.assertRaises(LookupError):
+            handler.HANDLERS['not a type']
+
+    def test__resolution_is_cached(self):
+        table = self.handler_class.__dict__['HANDLERS'].get_dispatch_table(self.handler_class)
+        self.assertNotIn(ValueError, table)
+        self.handler_class().HANDLERS.get(ValueError)
+        self.assertIs(table[ValueError], table[Exception])
+        self.handler_class().HANDLERS.get(int)
+        self.assertIn(int, table)
+
+    def test__registration_invalidates_cache(self):
+        handler = self.handler_class()
+        self.assertEquals(self._dispatch(handler, ValueError())[0], 'exception')
+        self.handler_class.__dict__['HANDLERS'].register(ValueError, lambda self, message: ('value', message))
+        self.assertEquals(self._dispatch(handler, ValueError())[0], 'value')
+
+    def test__subclass_registrations_are_merged(self):
+        handler = self.specific_handler_class()
+        self.assertEquals(self._dispatch(handler, KeyError())[0], 'key')
+        self.assertEquals(self._dispatch(handler, IndexError()), ('lookup', self.specific_handler_class))
+        self.assertEquals(self._dispatch(handler, ValueError())[0], 'any')
+        self.assertEquals(self._dispatch(self.handler_class(), KeyError())[0], 'lookup')
+
+    def test__base_registration_invalidates_subclass(self):
+        handler = self.specific_handler_class()
+        self.assertEquals(self._dispatch(handler, IndexError())[0], 'lookup')
+        self.handler_class.__dict__['HANDLERS'].register(IndexError, lambda self, message: ('index', message))
+        self.assertEquals(self._dispatch(handler, IndexError())[0], 'index')
+
+    def test__subclass_without_map(self):
+        class OtherHandler(self.specific_handler_class):
+            pass
+        self.assertEquals(self._dispatch(OtherHandler(), IndexError()), ('lookup', OtherHandler))
@@ -80,3 +80,144 @@ def test_install_mixin__multiple_inheritence3():
 
     d.foo()
     assert d.a == 1
+
+def test_install_mixin__shadow_class_is_shared():
+    class A(object):
+        pass
+    class B(object):
+        pass
+    objs = [A() for _ in range(3)]
+    for obj in objs:
+        install_mixin(obj, B)
+        install_mixin(obj, B)
+    assert len(set(type(obj) for obj in objs)) == 1
+    assert type(objs[0]).__mixins__ == [B]
+
+def test_install_mixin__threads():
+    import threading
+    class A(object):
+        pass
+    class B(object):
+        pass
+    objs = [A() for _ in range(20)]
+    barrier = threading.Event()
+    def install(obj):
+        barrier.wait()
+        install_mixin(obj, B)
+    threads = [threading.Thread(target=install, args=(obj,)) for obj in objs]
+    for thread in threads:
+        thread.start()
+    barrier.set()
+    for thread in threads:
+        thread.join()
+    assert len(set(type(obj) for obj in objs)) == 1
+
+def test_shadow_class_cache__unused_classes_are_collected():
+    import gc
+    from infi.pyutils.mixin import _ShadowClassCache
+    cache = _ShadowClassCache(max_recent=2)
+    class A(object):
+        pass
+    mixins = [type("M%s" % index, (object,), {}) for index in range(10)]
+    for mixin in mixins:
+        cache.get((A, mixin), lambda: type("A[M]", (mixin, A), {}))
+    gc.collect()
+    assert len(cache) == 2
+    created = cache.get((A, mixins[-1]), lambda: None)
+    assert created is not None and issubclass(created, mixins[-1])
+
+def test_install_mixins():
+    class A(object):
+        pass
+    class B(object):
+        pass
+    class M1(object):
+        def foo(self):
+            return 1
+    class M2(object):
+        def foo(self):
+            return 2
+    objs = [A(), B(), A(), B()]
+    install_mixin(objs[2], M1)
+    install_mixins(objs, M1, M2)
+    assert [type(obj).__mixins__ for obj in objs] == [[M1, M2]] * 4
+    assert type(objs[0]) is type(objs[2])
+    assert [obj.foo() for obj in objs] == [1] * 4
+    expected = A()
+    install_mixin(expected, M1)
+    install_mixin(expected, M2)
+    assert type(expected) is type(objs[0])
+
+def test_install_mixins__nothing_to_install():
+    class A(object):
+        pass
+    class M(object):
+        pass
+    obj = A()
+    install_mixins([obj])
+    assert type(obj) is A
+    install_mixins([obj], M, M)
+    cls = type(obj)
+    assert cls.__mixins__ == [M]
+    install_mixins([obj], M)
+    assert type(obj) is cls
+
+def test_install_mixin__order_independent():
+    class A(object):
+        pass
+    class M1(object):
+        def foo(self):
+            return 1
+    class M2(object):
+        def foo(self):
+            return 2
+    a1 = A()
+    install_mixin(a1, M1)
+    install_mixin(a1, M2)
+    a2 = A()
+    install_mixin(a2, M2)
+    install_mixin(a2, M1)
+    assert type(a1) is type(a2)
+    assert type(a1).__name__ == "A[M1, M2]"
+    assert a1.foo() == 1
+
+def test_install_mixin__priority():
+    class A(object):
+        pass
+    class M1(object):
+        def foo(self):
+            return 1
+    class M2(object):
+        __mixin_priority__ = 1
+        def foo(self):
+            return 2
+    class M0(M2):
+        __mixin_priority__ = 0
+        def foo(self):
+            return 0
+    a = A()
+    install_mixins([a], M1, M2)
+    assert type(a).__mixins__ == [M2, M1]
+    assert a.foo() == 2
+    # a subclass always comes before its bases, whatever its priority
+    install_mixin(a, M0)
+    assert type(a).__mixins__ == [M0, M2, M1]
+    assert a.foo() == 0
+
+def test_get_shadow_class_report():
+    class A(object):
+        pass
+    class M1(object):
+        pass
+    class M2(object):
+        pass
+    objs = [A(), A(), A()]
+    install_mixins(objs[:2], M1, M2)
+    install_mixin(objs[2], M2)
+    report = get_shadow_class_report()
+    infos = dict((info.shadow_class, info) for info in report.classes)
+    assert infos[type(objs[0])].mixins == (M1, M2)
+    assert infos[type(objs[2])].real_class is A
+    assert infos[type(objs[2])].size > 0
+    assert report.num_classes == len(report.classes) >= 2
+    assert report.total_size == sum(info.size for info in report.classes)
@@ -0,0 +1,227 @@
+import itertools
+from unittest import skipIf
+from .test_utils import TestCase
+from infi.pyutils.enums import Value
+from infi.pyutils.predicates import (
+    Predicate,
+    AlwaysTrue,
+    AlwaysFalse,
+    And,
+    Or,
+    Not,
+    Identity,
+    Equality,
+    ObjectAttributes,
+    DictionaryItems,
+    numpy,
+    )
+
+class CompiledPredicateTest(TestCase):
+    def setUp(self):
+        super(CompiledPredicateTest, self).setUp()
+        self.objects = [Record(status=status, pool=pool)
+                        for status, pool in itertools.product(['ok', 'failed', 'degraded'], range(4))]
+        self.objects.extend([None, Object(), {}, {'status': 'ok'}, {'status': 'ok', 'pool': 2}])
+
+    def assertCompiledEquivalent(self, pred):
+        compiled = pred.compile()
+        self.assertEqual([compiled(obj) for obj in self.objects], [bool(pred(obj)) for obj in self.objects])
+        return compiled
+
+    def test__leaves(self):
+        for pred in [AlwaysTrue, AlwaysFalse, Identity(None), Equality({}), ObjectAttributes(status='ok'),
+                     ObjectAttributes(status='ok', pool=2), ObjectAttributes(), DictionaryItems(),
+                     Predicate(lambda obj: isinstance(obj, dict))]:
+            self.assertCompiledEquivalent(pred)
+
+    def test__dictionary_items(self):
+        self.objects = [{}, {'status': 'ok'}, {'status': 'failed'}, {'status': 'ok', 'pool': 2}]
+        self.assertCompiledEquivalent(DictionaryItems(status='ok', pool=2))
+        self.assertCompiledEquivalent(Not(DictionaryItems(status='ok')))
+
+    def test__aggregates(self):
+        self.assertCompiledEquivalent(And(Or(ObjectAttributes(status='ok'), ObjectAttributes(pool=3)),
+                                          Not(ObjectAttributes(pool=1)), Not(Identity(None))))
+        self.assertCompiledEquivalent(Or(Identity(None), Equality({}), And(ObjectAttributes(status='degraded'))))
+        self.assertCompiledEquivalent(And())
+        self.assertCompiledEquivalent(Or())
+        self.assertCompiledEquivalent(Not(Not(AlwaysFalse)))
+
+    def test__short_circuit(self):
+        called = []
+        def callback(obj):
+            called.append(obj)
+            return True
+        compiled = And(Identity(None), Predicate(callback)).compile()
+        self.assertFalse(compiled(1))
+        self.assertEqual(called, [])
+        self.assertTrue(compiled(None))
+        self.assertEqual(called, [None])
+
+    def test__deep_tree(self):
+        pred = ObjectAttributes(status='ok')
+        for index in range(100):
+            pred = And(Not(Not(pred)), AlwaysTrue) if index % 2 else Or(pred, AlwaysFalse)
+        self.assertCompiledEquivalent(pred)
+
+    def test__subclasses_are_called(self):
+        class NotEqual(Equality):
+            def __call__(self, obj):
+                return not super(NotEqual, self).__call__(obj)
+        self.assertCompiledEquivalent(And(NotEqual(None), Not(Identity(None))))
+
+    def test__compile_is_idempotent(self):
+        compiled = self.assertCompiledEquivalent(ObjectAttributes(pool=2))
+        self.assertIs(compiled.compile(), compiled)
+        self.assertCompiledEquivalent(Or(compiled, Identity(None)))
+        self.assertEqual(repr(compiled), "<compiled <.pool==2>>")
+
+class FilterTest(TestCase):
+    def test__filter(self):
+        records = [Record(status=status, pool=pool) for status, pool in itertools.product(['ok', 'failed'], range(3))]
+        pred = And(ObjectAttributes(status='ok'), Not(ObjectAttributes(pool=1)))
+        self.assertEqual(pred.filter(records), [records[0], records[2]])
+        self.assertEqual(pred.filter(iter(records)), [records[0], records[2]])
+        self.assertEqual(AlwaysFalse.filter(records), [])
+
+class MaskTest(TestCase):
+    def setUp(self):
+        super(MaskTest, self).setUp()
+        self.columns = dict(status=['ok', 'failed', 'ok', 'degraded'], pool=[1, 2, 3, 1])
+        self.rows = [dict(zip(self.columns, values)) for values in zip(*self.columns.values())]
+
+    def assertMaskEquivalent(self, pred, columns=None):
+        mask = pred.mask(self.columns if columns is None else columns)
+        self.assertEqual(list(mask), [bool(pred(row)) for row in self.rows])
+        return mask
+
+    def test__mask(self):
+        for pred in [DictionaryItems(status='ok'), DictionaryItems(status='ok', pool=3), DictionaryItems(missing=1),
+                     DictionaryItems(), AlwaysTrue, AlwaysFalse, Not(DictionaryItems(pool=1)),
+                     And(Or(DictionaryItems(status='ok'), DictionaryItems(pool=1)), Not(DictionaryItems(pool=3))),
+                     Or(), And(), DictionaryItems(pool=1).compile()]:
+            mask = self.assertMaskEquivalent(pred)
+            self.assertIsInstance(mask, list)
+
+    def test__object_attributes(self):
+        self.assertEqual(ObjectAttributes(status='ok', pool=1).mask(self.columns), [True, False, False, False])
+        self.assertEqual(ObjectAttributes(missing=1).mask(self.columns), [False] * 4)
+
+    def test__row_wise_fallback(self):
+        self.assertMaskEquivalent(Predicate(lambda row: row['pool'] > 1))
+        self.assertMaskEquivalent(Or(DictionaryItems(status='degraded'), Predicate(lambda row: row['pool'] == 2)))
+        self.assertEqual(Predicate(lambda row: row.pool > 1).mask(self.columns), [False, True, True, False])
+        self.assertEqual(Predicate(lambda row: getattr(row, 'missing', None)).mask(self.columns), [False] * 4)
+
+    def test__row_wise_fallback_short_circuits(self):
+        columns = dict(kind=['vol', 'pool', 'vol'], size=[20, None, 5])
+        pred = And(ObjectAttributes(kind='vol'), Predicate(lambda row: row.size > 10))
+        self.assertEqual(pred.mask(columns), [True, False, False])
+        pred = Or(Not(ObjectAttributes(kind='vol')), Predicate(lambda row: row.size > 10))
+        self.assertEqual(pred.mask(columns), [True, True, False])
+        calls = []
+        def is_large(row):
+            calls.append(row['size'])
+            return row['size'] > 10
+        pred = And(DictionaryItems(kind='vol'), Predicate(is_large), Not(Predicate(lambda row: row['size'] is None)))
+        self.assertEqual(pred.mask(columns), [True, False, False])
+        self.assertEqual(calls, [20, 5])
+
+    def test__empty_columns(self):
+        self.assertEqual(DictionaryItems(a=1).mask({}), [])
+        self.assertEqual(DictionaryItems(a=1).mask(dict(a=[])), [])
+
+    def test__columns_of_different_lengths(self):
+        with self.assertRaises(ValueError):
+            DictionaryItems(a=1).mask(dict(a=[1, 2], b=[1]))
+
+    @skipIf(numpy is None, "NumPy is not installed")
+    def test__numpy_columns(self):
+        self.columns['pool'] = numpy.array(self.columns['pool'])
+        pred = And(Or(DictionaryItems(status='ok'), DictionaryItems(pool=1)), Not(DictionaryItems(pool=3)))
+        mask = self.assertMaskEquivalent(pred)
+        self.assertIsInstance(mask, numpy.ndarray)
+        self.assertEqual(mask.dtype, bool)
+
+class SimplifyTest(TestCase):
+    def setUp(self):
+        super(SimplifyTest, self).setUp()
+        self.is_dict = Predicate(lambda obj: isinstance(obj, dict))
+
+    def test__flatten(self):
+        pred = And(ObjectAttributes(a=1), And(ObjectAttributes(b=2), And(ObjectAttributes(c=3))))
+        self.assertEqual(repr(pred.simplify()), "And(<.a==1>, <.b==2>, <.c==3>)")
+        pred = Or(Identity(None), And(Or(Equality(1), Equality(2))))
+        self.assertEqual(repr(pred.simplify()), "Or(<is None>, < == 1>, < == 2>)")
+
+    def test__fold_constants(self):
+        self.assertIs(And(Identity(None), AlwaysFalse).simplify(), AlwaysFalse)
+        self.assertIs(Or(Identity(None), Not(AlwaysFalse)).simplify(), AlwaysTrue)
+        self.assertIs(And().simplify(), AlwaysTrue)
+        self.assertIs(Or(AlwaysFalse).simplify(), AlwaysFalse)
+        equals_1 = Equality(1)
+        self.assertIs(And(AlwaysTrue, equals_1, Or(AlwaysFalse, And())).simplify(), equals_1)
+
+    def test__double_negation(self):
+        is_none = Identity(None)
+        self.assertIs(Not(Not(is_none)).simplify(), is_none)
+        self.assertEqual(repr(Not(Not(Not(is_none))).simplify()), "<not <is None>>")
+        not_none = Not(is_none)
+        self.assertIs(not_none.simplify(), not_none)
+
+    def test__deduplicate(self):
+        pred = And(self.is_dict, DictionaryItems(a=1), Not(Identity(None)), DictionaryItems(a=1),
+                   Not(Identity(None)), self.is_dict, Predicate(self.is_dict._func))
+        self.assertEqual(len(pred.simplify()._preds), 3)
+        self.assertEqual(len(Or(Equality([]), Equality([])).simplify()._preds), 2)
+
+    def test__enum_values_are_not_deduplicated(self):
+        ok = Value('ok', ['good'])
+        for pred in [And(Equality(ok), Equality('ok')), And(ObjectAttributes(status=ok), ObjectAttributes(status='ok')),
+                     And(DictionaryItems(status=ok), DictionaryItems(status='ok'))]:
+            self.assertEqual(len(pred.simplify()._preds), 2)
+        pred = And(Equality(ok), Equality('ok'))
+        self.assertFalse(pred.simplify()('good'))
+        self.assertTrue(pred.simplify()('ok'))
+
+    def test__reorder_by_cost(self):
+        pred = And(DictionaryItems(a=1, b=2), Identity(None))
+        self.assertEqual([type(p) for p in pred.simplify()._preds], [Identity, DictionaryItems])
+        pred = And(DictionaryItems(a=1, b=2), Identity(None), self.is_dict, DictionaryItems(a=1, b=2, c=3), Equality(1))
+        self.assertEqual([type(p) for p in pred.simplify()._preds],
+                         [Identity, DictionaryItems, Predicate, Equality, DictionaryItems])
+
+    def test__functions_guard_later_children(self):
+        pred = And(self.is_dict, DictionaryItems(a=1))
+        simplified = pred.simplify()
+        self.assertEqual([type(p) for p in simplified._preds], [Predicate, DictionaryItems])
+        self.assertFalse(simplified(None))
+        pred = Or(Not(self.is_dict), Not(DictionaryItems(a=1)))
+        self.assertFalse(pred.simplify()({'a': 1}))
+        self.assertTrue(pred.simplify()(None))
+
+    def test__reorder_by_selectivity(self):
+        samples = [{'a': 1, 'b': index % 10} for index in range(100)]
+        pred = And(DictionaryItems(a=1), DictionaryItems(b=3))
+        self.assertEqual(repr(pred.simplify(samples)), "And(<['b']==3>, <['a']==1>)")
+        pred = Or(DictionaryItems(b=3), DictionaryItems(a=1))
+        self.assertEqual(repr(pred.simplify(samples)), "Or(<['a']==1>, <['b']==3>)")
+
+    def test__failing_samples_keep_order(self):
+        pred = And(self.is_dict, DictionaryItems(a=1))
+        self.assertEqual(repr(pred.simplify([None, {}])._preds[1]), "<['a']==1>")
+
+    def test__equivalence(self):
+        samples = [None, {}, {'a': 1}, {'a': 1, 'b': 2}, {'a': 2, 'b': 2}]
+        pred = Or(And(self.is_dict, Not(Not(DictionaryItems(a=1))), AlwaysTrue), Identity(None),
+                  And(self.is_dict, Or(DictionaryItems(b=2), AlwaysFalse), DictionaryItems(b=2)))
+        for simplified in [pred.simplify(), pred.simplify(samples), pred.compile().simplify()]:
+            self.assertEqual([bool(simplified(sample)) for sample in samples], [bool(pred(sample)) for sample in samples])
+
+class Object(object):
+    pass
+
+class Record(object):
+    def __init__(self, **attributes):
+        super(Record, self).__init__()
+        self.__dict__.update(attributes)
@@ -1,10 +1,23 @@
+import gc
 import itertools
 import functools
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from .test_utils import TestCase
 from infi.pyutils import iterate
 from infi.pyutils.reference_counter import (
     ReferenceCounter,
+    ThreadSafeReferenceCounter,
+    LingeringReferenceCounter,
     InvalidReferenceCount,
+    DependencyCycle,
+    enable_reference_tracing,
+    disable_reference_tracing,
+    get_live_counters,
+    get_leaked_counters,
+    log_leaked_counters,
     )
 
 class ReferenceCounterTest(TestCase):
@@ -138,6 +151,380 @@ class DependentReferenceCounterWithExceptionTest(TestCase):
         for index, counter in enumerate(itertools.chain([self.master], self.slaves)):
             self.assertEquals(counter.get_reference_count(), value)
 
+class DependencyGraphTest(TestCase):
+    def setUp(self):
+        super(DependencyGraphTest, self).setUp()
+        # root -> (left, right) -> shared -> leaves
+        self.leaves = [ConcurrencyTrackingReferenceCounter(self) for _ in range(4)]
+        self.shared = ConcurrencyTrackingReferenceCounter(self)
+        self.left = ConcurrencyTrackingReferenceCounter(self)
+        self.right = ConcurrencyTrackingReferenceCounter(self)
+        self.root = ReferenceCounter()
+        for leaf in self.leaves:
+            self.shared.depend_on_counter(leaf)
+        for counter in (self.left, self.right):
+            counter.depend_on_counter(self.shared)
+            self.root.depend_on_counter(counter)
+        self.concurrent = self.max_concurrent = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(4)
+    def tearDown(self):
+        self.executor.shutdown()
+        super(DependencyGraphTest, self).tearDown()
+    def _all_counters(self):
+        return self.leaves + [self.shared, self.left, self.right]
+
+    def test__cycles_are_rejected(self):
+        with self.assertRaises(DependencyCycle):
+            self.leaves[0].depend_on_counter(self.root)
+        with self.assertRaises(DependencyCycle):
+            self.root.depend_on_counter(self.root)
+        self.assertEquals(self.leaves[0]._depends_on, [])
+        thread_safe = ThreadSafeReferenceCounter()
+        thread_safe.depend_on_counter(self.root)
+        with self.assertRaises(DependencyCycle):
+            self.shared.depend_on_counter(thread_safe)
+
+    def test__parallel_activation(self):
+        self.root.set_dependency_executor(self.executor)
+        with self.root.get_reference_context():
+            for counter in self._all_counters():
+                self.assertTrue(counter.active)
+            self.assertEquals([leaf.get_reference_count() for leaf in self.leaves], [1] * 4)
+            self.assertEquals(self.shared.get_reference_count(), 2)
+            self.assertEquals(self.left.get_reference_count(), 1)
+        for counter in self._all_counters():
+            self.assertFalse(counter.active)
+            self.assertEquals(counter.get_reference_count(), 0)
+            self.assertEquals(counter.num_activations, 1)
+        self.assertGreater(self.max_concurrent, 1)
+
+    def test__parallel_activation_failure(self):
+        self.root.set_dependency_executor(self.executor)
+        self.leaves[2].raise_on_addref = True
+        with self.assertRaises(MyException):
+            self.root.add_reference()
+        for counter in self._all_counters():
+            self.assertFalse(counter.active)
+            self.assertEquals(counter.get_reference_count(), 0)
+        self.assertEquals(self.root.get_reference_count(), 0)
+        self.assertEquals(self.shared.num_activations, 0)
+
+    def test__shared_plain_dependency_activates_sequentially(self):
+        plain = ReferenceCounter()
+        plain.add_reference()
+        siblings = [ConcurrencyTrackingReferenceCounter(self) for _ in range(8)]
+        root = ReferenceCounter()
+        for sibling in siblings:
+            sibling.depend_on_counter(plain)
+            root.depend_on_counter(sibling)
+        root.set_dependency_executor(self.executor)
+        with root.get_reference_context():
+            self.assertEquals(plain.get_reference_count(), 1 + len(siblings))
+            self.assertTrue(all(sibling.active for sibling in siblings))
+        self.assertEquals(plain.get_reference_count(), 1)
+        self.assertEquals(self.max_concurrent, 1)
+
+class ReferenceTracingTest(TestCase):
+    def setUp(self):
+        super(ReferenceTracingTest, self).setUp()
+        enable_reference_tracing()
+        self.addCleanup(disable_reference_tracing)
+
+    def test__live_counters(self):
+        counter = ReferenceCounter()
+        thread_safe_counter = ThreadSafeReferenceCounter()
+        self.assertEquals(get_live_counters(), [])
+        counter.add_reference()
+        counter.add_reference()
+        with thread_safe_counter.get_reference_context():
+            live = dict((live.counter, live) for live in get_live_counters())
+            self.assertEquals(set(live), set([counter, thread_safe_counter]))
+        self.assertEquals(live[counter].reference_count, 2)
+        self.assertEquals(len(live[counter].call_sites), 2)
+        self.assertEquals(live[thread_safe_counter].reference_count, 1)
+        counter.remove_reference()
+        [live] = get_live_counters()
+        self.assertIs(live.counter, counter)
+        self.assertEquals(live.reference_count, 1)
+        self.assertEquals(len(live.call_sites), 1)
+        counter.remove_reference()
+        self.assertEquals(get_live_counters(), [])
+
+    def test__call_sites(self):
+        counter = ReferenceCounter()
+        with counter.get_reference_context():
+            [live] = get_live_counters()
+        [call_site] = live.call_sites
+        filename, _, function_name = call_site[0]
+        self.assertEquals(function_name, 'test__call_sites')
+        self.assertEquals(filename, self.test__call_sites.__code__.co_filename)
+
+    def test__sampling(self):
+        enable_reference_tracing(sample_rate=0)
+        counter = ReferenceCounter()
+        counter.add_reference()
+        [live] = get_live_counters()
+        self.assertEquals(live.reference_count, 1)
+        self.assertEquals(live.call_sites, [])
+
+    def test__leaked_counters(self):
+        counter = ReferenceCounter()
+        counter.add_reference()
+        self.assertEquals(get_leaked_counters(60), [])
+        [leaked] = get_leaked_counters(0)
+        self.assertIs(leaked.counter, counter)
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger = logging.getLogger(__name__)
+        logger.addHandler(handler)
+        try:
+            log_leaked_counters(0, logger)
+        finally:
+            logger.removeHandler(handler)
+        [record] = records
+        self.assertIn('test__leaked_counters', record.getMessage())
+
+    def test__unhashable_counters(self):
+        class UnhashableReferenceCounter(ReferenceCounter):
+            def __eq__(self, other):
+                return self is other
+            __hash__ = None
+        counter = UnhashableReferenceCounter()
+        counter.add_reference()
+        self.assertEquals(counter.get_reference_count(), 1)
+        [live] = get_live_counters()
+        self.assertIs(live.counter, counter)
+        counter.remove_reference()
+        self.assertEquals(get_live_counters(), [])
+
+    def test__collected_counters_are_forgotten(self):
+        counter = ReferenceCounter()
+        counter.add_reference()
+        del counter
+        gc.collect()
+        self.assertEquals(get_live_counters(), [])
+
+    def test__disabled(self):
+        disable_reference_tracing()
+        counter = ReferenceCounter()
+        counter.add_reference()
+        self.assertEquals(get_live_counters(), [])
+
+class ConcurrencyTrackingReferenceCounter(ThreadSafeReferenceCounter):
+    def __init__(self, test):
+        super(ConcurrencyTrackingReferenceCounter, self).__init__()
+        self.test = test
+        self.active = False
+        self.num_activations = 0
+        self.raise_on_addref = False
+    def _on_reference_first_added(self):
+        if self.raise_on_addref:
+            raise MyException()
+        with self.test.lock:
+            self.test.concurrent += 1
+            self.test.max_concurrent = max(self.test.max_concurrent, self.test.concurrent)
+        time.sleep(0.02)
+        with self.test.lock:
+            self.test.concurrent -= 1
+        self.num_activations += 1
+        self.active = True
+    def _on_reference_last_dropped(self):
+        self.active = False
+
+class ThreadSafeReferenceCounterTest(TestCase):
+    num_threads = 20
+    num_iterations = 200
+
+    def _run_threads(self, target):
+        errors = []
+        def _target():
+            try:
+                target()
+            except BaseException as e:
+                errors.append(e)
+        threads = [threading.Thread(target=_target) for _ in range(self.num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(errors, [])
+
+    def test__transitions_are_atomic(self):
+        counter = TrackingReferenceCounter()
+        dependency = ThreadSafeReferenceCounter()
+        counter.depend_on_counter(dependency)
+        def _target():
+            for _ in range(self.num_iterations):
+                with counter.get_reference_context():
+                    assert counter.active
+                    assert dependency.get_reference_count() == 1
+        self._run_threads(_target)
+        self.assertEquals(counter.get_reference_count(), 0)
+        self.assertEquals(dependency.get_reference_count(), 0)
+        self.assertFalse(counter.active)
+        self.assertEquals(counter.num_activations, counter.num_deactivations)
+        self.assertGreater(counter.num_activations, 0)
+
+    def test__acquirers_wait_for_first_added(self):
+        counter = TrackingReferenceCounter(delay=0.05)
+        def _target():
+            counter.add_reference()
+            assert counter.active
+        self._run_threads(_target)
+        self.assertEquals(counter.num_activations, 1)
+        self.assertEquals(counter.get_reference_count(), self.num_threads)
+
+    def test__failed_first_added(self):
+        counter = TrackingReferenceCounter()
+        counter.raise_on_addref = True
+        with self.assertRaises(MyException):
+            counter.add_reference()
+        self.assertEquals(counter.get_reference_count(), 0)
+        counter.raise_on_addref = False
+        counter.add_reference()
+        self.assertEquals(counter.get_reference_count(), 1)
+        self.assertTrue(counter.active)
+
+    def test__failed_last_dropped(self):
+        counter = TrackingReferenceCounter()
+        counter.add_reference()
+        counter.raise_on_decref = True
+        with self.assertRaises(MyException):
+            counter.remove_reference()
+        self.assertEquals(counter.get_reference_count(), 1)
+        counter.raise_on_decref = False
+        counter.remove_reference()
+        with self.assertRaises(InvalidReferenceCount):
+            counter.remove_reference()
+
+class LingeringReferenceCounterTest(TestCase):
+    def setUp(self):
+        super(LingeringReferenceCounterTest, self).setUp()
+        self.scheduled = []
+        self.counter = TrackingLingeringReferenceCounter(self._call_later)
+    def _call_later(self, delay, callback):
+        handle = FakeTimerHandle(delay, callback)
+        self.scheduled.append(handle)
+        return handle
+    def _fire_timers(self):
+        for handle in self.scheduled:
+            if not handle.cancelled:
+                handle.callback()
+
+    def test__release_is_deferred(self):
+        self.counter.add_reference()
+        self.counter.remove_reference()
+        self.assertEquals(self.counter.get_reference_count(), 0)
+        self.assertTrue(self.counter.active)
+        self.assertTrue(self.counter.is_lingering())
+        self.assertEquals([handle.delay for handle in self.scheduled], [10])
+        self._fire_timers()
+        self.assertFalse(self.counter.active)
+        self.assertFalse(self.counter.is_lingering())
+        self.assertEquals(self.counter.num_deactivations, 1)
+
+    def test__new_reference_cancels_release(self):
+        for _ in range(3):
+            with self.counter.get_reference_context():
+                self.assertTrue(self.counter.active)
+        self.assertEquals(self.counter.num_activations, 1)
+        self.assertEquals([handle.cancelled for handle in self.scheduled], [True, True, False])
+        self._fire_timers()
+        self.assertEquals(self.counter.num_deactivations, 1)
+        with self.assertRaises(InvalidReferenceCount):
+            self.counter.remove_reference()
+
+    def test__release_lingering(self):
+        self.assertFalse(self.counter.release_lingering())
+        dependency = ReferenceCounter()
+        self.counter.depend_on_counter(dependency)
+        called = []
+        self.counter.add_zero_refcount_callback(called.append)
+        with self.counter.get_reference_context():
+            pass
+        self.assertEquals(dependency.get_reference_count(), 1)
+        self.assertEquals(called, [])
+        self.assertTrue(self.counter.release_lingering())
+        self.assertEquals(dependency.get_reference_count(), 0)
+        self.assertEquals(called, [self.counter])
+        self._fire_timers()
+        self.assertEquals(self.counter.num_deactivations, 1)
+
+    def test__depend_on_counter_while_lingering(self):
+        dependency = ReferenceCounter()
+        with self.counter.get_reference_context():
+            pass
+        self.counter.depend_on_counter(dependency)
+        self.assertEquals(dependency.get_reference_count(), 1)
+        self._fire_timers()
+        self.assertEquals(dependency.get_reference_count(), 0)
+
+    def test__failed_deferred_release(self):
+        with self.counter.get_reference_context():
+            pass
+        self.counter.raise_on_decref = True
+        self._fire_timers()
+        self.assertTrue(self.counter.active)
+        self.assertTrue(self.counter.is_lingering())
+        with self.assertRaises(MyException):
+            self.counter.release_lingering()
+        self.counter.raise_on_decref = False
+        with self.counter.get_reference_context():
+            pass
+        self.assertEquals(self.counter.num_activations, 1)
+        self.assertTrue(self.counter.release_lingering())
+        self.assertFalse(self.counter.active)
+
+    def test__timer_thread(self):
+        counter = TrackingLingeringReferenceCounter(linger=0.01)
+        with counter.get_reference_context():
+            pass
+        self.assertTrue(counter.active)
+        for _ in range(100):
+            if not counter.active:
+                break
+            time.sleep(0.01)
+        self.assertFalse(counter.active)
+        self.assertFalse(counter.is_lingering())
+
+class FakeTimerHandle(object):
+    def __init__(self, delay, callback):
+        super(FakeTimerHandle, self).__init__()
+        self.delay = delay
+        self.callback = callback
+        self.cancelled = False
+    def cancel(self):
+        self.cancelled = True
+
+class TrackingReferenceCounter(ThreadSafeReferenceCounter):
+    def __init__(self, delay=0):
+        super(TrackingReferenceCounter, self).__init__()
+        self._reset_tracking(delay)
+    def _reset_tracking(self, delay=0):
+        self.delay = delay
+        self.active = False
+        self.num_activations = self.num_deactivations = 0
+        self.raise_on_addref = self.raise_on_decref = False
+    def _on_reference_first_added(self):
+        assert not self.active
+        if self.raise_on_addref:
+            raise MyException()
+        time.sleep(self.delay)
+        self.num_activations += 1
+        self.active = True
+    def _on_reference_last_dropped(self):
+        assert self.active
+        if self.raise_on_decref:
+            raise MyException()
+        self.active = False
+        self.num_deactivations += 1
+
+class TrackingLingeringReferenceCounter(TrackingReferenceCounter, LingeringReferenceCounter):
+    def __init__(self, call_later=None, linger=10):
+        LingeringReferenceCounter.__init__(self, linger, call_later)
+        self._reset_tracking()
 
 class MyException(Exception):
     @classmethod